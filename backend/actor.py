@@ -0,0 +1,83 @@
+"""Module responsable for applying the changes to the game state one at a time"""
+
+import asyncio
+import inspect
+import logging
+from typing import Any, Awaitable, Callable
+
+
+class CommandActor:
+    """Class to serialize every change to the game state in a single task
+
+    Endpoints, buzz presses and deadlines submit jobs to one queue, and a
+    task on the event loop runs them in the order they were submitted. The
+    game state is only changed by that task, so nothing else needs a lock,
+    and every job that succeeds publishes the state exactly once.
+
+    A job can be a coroutine function, to wait for blocking work done in a
+    worker thread, the next job only starts once it is done.
+    """
+
+    def __init__(
+        self,
+        prepare: Callable[[], None],
+        publish: Callable[[], Awaitable[None]],
+    ):
+        """Initialize the actor
+
+        Args:
+            prepare (Callable[[], None]): called before each job
+            publish (Callable[[], Awaitable[None]]): called after each job that succeeds
+        """
+        self.prepare = prepare
+        self.publish = publish
+        self.queue: asyncio.Queue | None = None
+        self.task: asyncio.Task | None = None
+
+    def start(self):
+        """start running the jobs, in the event loop"""
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self.__serve())
+
+    def stop(self):
+        """stop running the jobs, the ones still queued fail"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        while self.queue is not None and not self.queue.empty():
+            _, done = self.queue.get_nowait()
+            done.cancel()
+
+    async def run(self, job: Callable[[], Any]) -> Any:
+        """run a job after the ones already submitted
+
+        Args:
+            job (Callable[[], Any]): changes the game state, can be a coroutine function
+
+        Returns:
+            Any: the result of the job, once the state was published
+        """
+        done = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((job, done))
+        return await done
+
+    async def __serve(self):
+        """run the queued jobs one at a time"""
+        while True:
+            job, done = await self.queue.get()
+            if done.cancelled():
+                continue
+            try:
+                self.prepare()
+                result = job()
+                if inspect.isawaitable(result):
+                    result = await result
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                done.set_exception(e)
+                continue
+            try:
+                await self.publish()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logging.error("Failed to publish the state: %s", e)
+            if not done.cancelled():
+                done.set_result(result)
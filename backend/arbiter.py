@@ -0,0 +1,71 @@
+# pylint: disable=too-few-public-methods
+"""Module responsable for ordering the buzz presses by the time they were pressed"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable
+from tasks import spawn
+
+BUZZ_ARBITRATION_WINDOW = float(os.getenv("BUZZ_ARBITRATION_WINDOW", "0.02"))
+
+
+class BuzzArbiter:
+    """Class to apply the buzz presses in the order they were pressed
+
+    Presses do not reach the server in the order they were pressed, so the
+    first one received opens a window of BUZZ_ARBITRATION_WINDOW seconds, and
+    every press received within it is applied together, sorted by the time
+    stamped when the controller was read.
+    """
+
+    def __init__(
+        self,
+        apply: Callable[[list], Awaitable[None]],
+        window: float = BUZZ_ARBITRATION_WINDOW,
+    ):
+        """Initialize the arbiter
+
+        Args:
+            apply (Callable[[list], Awaitable[None]]): applies the presses, in order
+            window (float, optional): seconds to wait for other presses.
+                Defaults to BUZZ_ARBITRATION_WINDOW.
+        """
+        self.apply = apply
+        self.window = window
+        self.pending: list = []
+        self.applied: asyncio.Future | None = None
+        # flushes running
+        self.tasks: set[asyncio.Task] = set()
+
+    def submit(self, presses: list) -> asyncio.Future:
+        """queue presses to be applied when the current window closes
+
+        Args:
+            presses (list): the presses, each with the time "at" it was pressed
+
+        Returns:
+            asyncio.Future: done once the presses were applied
+        """
+        loop = asyncio.get_running_loop()
+        self.pending.extend(presses)
+        if self.applied is None:
+            self.applied = loop.create_future()
+            loop.call_later(self.window, self.__close)
+        return self.applied
+
+    def __close(self):
+        """close the window, applying its presses in a new task"""
+        spawn(self.tasks, self.__flush())
+
+    async def __flush(self):
+        """apply the presses of the window that closed, earliest first"""
+        presses = sorted(self.pending, key=lambda press: press["at"])
+        applied = self.applied
+        self.pending = []
+        self.applied = None
+        try:
+            await self.apply(presses)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            applied.set_exception(e)
+        else:
+            applied.set_result(None)
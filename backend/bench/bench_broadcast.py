@@ -0,0 +1,125 @@
+# pylint: disable=too-few-public-methods
+"""Benchmark of broadcasting the state to the websocket clients
+
+A broadcast only puts the encoded frame in the queue of every client, so
+its cost does not depend on how fast each socket drains. Every frame
+carries the time it was broadcast, and each fake client records how long
+it took to reach it. With a stalled client, one socket never finishes a
+send, its queue fills up and it is evicted, while the others keep getting
+every update on time.
+
+    python backend/bench/bench_broadcast.py
+"""
+
+import asyncio
+import time
+from common import percentiles
+
+# pylint: disable=wrong-import-order
+from broadcast import CLIENT_QUEUE_SIZE, Broadcaster
+
+UPDATES = 100
+# time between two updates, about the rate of a busy game
+INTERVAL = 0.005
+PADDING = "x" * 7800
+
+
+class Receipts:
+    """Class to collect the latency of the frames the fast clients received"""
+
+    def __init__(self, expected: int):
+        """Initialize the receipts
+
+        Args:
+            expected (int): the number of frames the fast clients must receive
+        """
+        self.expected = expected
+        self.latencies: list[float] = []
+        self.done = asyncio.Event()
+
+    def received(self, frame: str):
+        """record a frame received, by the time stamped at its start
+
+        Args:
+            frame (str): the frame
+        """
+        sent = int(frame[: frame.index(":")])
+        self.latencies.append((time.perf_counter_ns() - sent) / 1e9)
+        if len(self.latencies) == self.expected:
+            self.done.set()
+
+
+class FakeSocket:
+    """Class to stand in for a websocket, recording the frames it sent"""
+
+    def __init__(self, receipts: Receipts | None):
+        """Initialize the socket
+
+        Args:
+            receipts (Receipts | None): where to record the frames, None for a
+                socket that never finishes a send
+        """
+        self.receipts = receipts
+
+    async def send_text(self, frame: str):
+        """send a frame, or wait forever when stalled
+
+        Args:
+            frame (str): the frame
+        """
+        if self.receipts is None:
+            await asyncio.Event().wait()
+        self.receipts.received(frame)
+
+    async def close(self):
+        """close the socket"""
+
+
+async def measure(clients: int, stalled: bool) -> tuple:
+    """broadcast UPDATES frames to the clients
+
+    Args:
+        clients (int): the number of fast clients
+        stalled (bool): a client that never finishes a send is connected too
+
+    Returns:
+        tuple: the time of each broadcast, and of each frame to reach each
+            fast client
+    """
+    receipts = Receipts(clients * UPDATES)
+    broadcaster = Broadcaster()
+    sockets = [FakeSocket(receipts) for _ in range(clients)]
+    if stalled:
+        sockets.append(FakeSocket(None))
+    for ws in sockets:
+        broadcaster.connect(ws, "full", "fix")
+
+    samples = []
+    for _ in range(UPDATES):
+        start = time.perf_counter_ns()
+        broadcaster.broadcast({"fix": {"full": f"{start}:{PADDING}"}})
+        samples.append((time.perf_counter_ns() - start) / 1e9)
+        await asyncio.sleep(INTERVAL)
+    await receipts.done.wait()
+    assert len(broadcaster) == clients
+    for client in list(broadcaster.clients.values()):
+        client.task.cancel()
+    return samples, receipts.latencies
+
+
+def main():
+    """run the benchmark for a growing number of clients"""
+    print(
+        f"{UPDATES} updates {INTERVAL * 1e3:.0f} ms apart, "
+        f"a stalled client is evicted after {CLIENT_QUEUE_SIZE} frames"
+    )
+    for clients in (5, 50, 500):
+        for stalled in (False, True):
+            samples, latencies = asyncio.run(measure(clients, stalled))
+            name = f"{clients} clients" + (" and a stalled one" if stalled else "")
+            print(f"{name:>29}: broadcast {percentiles(samples)}")
+            print(f"{'':31}received {percentiles(latencies)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark of the time for a buzz press to be applied and acknowledged
+
+Starts the server with uvicorn and sends batches of two presses over the
+/ws/buzz channel, waiting for each ack. The presses wait for the
+arbitration window to close, set BUZZ_ARBITRATION_WINDOW to change it.
+The same presses posted one at a time to /buzz are shown for comparison.
+
+    python backend/bench/bench_buzz_channel.py
+"""
+
+import asyncio
+import json
+import time
+from common import serve, summary
+
+# pylint: disable=wrong-import-order
+import requests
+import websockets
+from arbiter import BUZZ_ARBITRATION_WINDOW
+
+BATCHES = 50
+
+
+async def channel(port: int) -> list:
+    """send the batches of presses over the websocket channel
+
+    Args:
+        port (int): the port of the server
+
+    Returns:
+        list: the time until each batch was acknowledged
+    """
+    samples = []
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws/buzz") as ws:
+        await ws.send(
+            json.dumps(
+                {"type": "hello", "session": "bench", "clock": time.monotonic_ns()}
+            )
+        )
+        for i in range(BATCHES):
+            presses = [
+                {
+                    "seq": 2 * i + j + 1,
+                    "controller": j,
+                    "color": "red",
+                    "at": time.monotonic_ns(),
+                }
+                for j in range(2)
+            ]
+            start = time.perf_counter()
+            await ws.send(json.dumps({"type": "presses", "presses": presses}))
+            while json.loads(await ws.recv()).get("type") != "ack":
+                pass
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def post(port: int) -> list:
+    """post the presses to /buzz one at a time
+
+    Args:
+        port (int): the port of the server
+
+    Returns:
+        list: the time of each request
+    """
+    samples = []
+    with requests.Session() as session:
+        for i in range(2 * BATCHES):
+            start = time.perf_counter()
+            session.post(
+                f"http://127.0.0.1:{port}/buzz",
+                json={"controller": i % 2, "color": "red"},
+                timeout=5,
+            ).raise_for_status()
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    """run the server and send the presses both ways"""
+    with serve() as port:
+        acked = asyncio.run(channel(port))
+        posted = post(port)
+
+    print(f"arbitration window {BUZZ_ARBITRATION_WINDOW * 1e3:.0f} ms")
+    print(f"/ws/buzz, batch of two presses acked: {summary(acked)}")
+    print(f"/buzz, one press posted: {summary(posted)}")
+
+
+if __name__ == "__main__":
+    main()
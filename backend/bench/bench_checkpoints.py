@@ -0,0 +1,161 @@
+"""Benchmark of saving the game after every command and restoring the latest save
+
+Plays the test board through the commands of the server, saving it both
+ways:
+
+- the event log, which records each command and takes a checkpoint every
+  CHECKPOINT_INTERVAL commands in a background thread
+- the pickle file the state was dumped to after every action before it
+
+A save is timed after the command was applied. Restoring opens the event
+log again, loading the last checkpoint and replaying the events after it,
+or loads the last pickle file. The bytes shown are the size of the files
+left in the saves directory and the disk space allocated to them.
+
+    python backend/bench/bench_checkpoints.py
+"""
+
+import os
+import pickle
+import tempfile
+import time
+from common import new_game, percentiles
+
+# pylint: disable=wrong-import-order
+from gamestate.commands import apply_command
+from saves import CHECKPOINT_INTERVAL, FULL_CHECKPOINT_INTERVAL, EventLog
+
+QUESTIONS = 30
+RESTORES = 50
+
+
+def commands() -> list:
+    """the commands playing the board, each team buzzing in turn
+
+    Returns:
+        list: the name and the payload of each command
+    """
+    played = []
+    for idx in range(QUESTIONS):
+        played += [
+            ("question", {"id": idx}),
+            ("buzz_start", {}),
+            ("buzz", {"controller": idx % 3, "color": "red"}),
+            ("answer", {"correct": idx % 4 != 0}),
+        ]
+    return played
+
+
+def disk_usage(directory: str) -> tuple:
+    """measure the files of a directory
+
+    Args:
+        directory (str): the directory
+
+    Returns:
+        tuple: the bytes in the files, and the bytes allocated to them on disk
+    """
+    size = allocated = 0
+    for name in os.listdir(directory):
+        stat = os.stat(os.path.join(directory, name))
+        size += stat.st_size
+        allocated += stat.st_blocks * 512
+    return size, allocated
+
+
+def timed(action) -> list:
+    """time an action, RESTORES times
+
+    Args:
+        action (Callable[[], Any]): the action
+
+    Returns:
+        list: the time of each run
+    """
+    samples = []
+    for _ in range(RESTORES):
+        start = time.perf_counter()
+        action()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def event_log(directory: str) -> tuple:
+    """save with the event log and restore from it
+
+    Args:
+        directory (str): the saves directory
+
+    Returns:
+        tuple: the save and restore times
+    """
+    path = os.path.join(directory, "saves.db")
+    log = EventLog(path)
+    state = log.open(new_game)
+    saves = []
+    for name, payload in commands():
+        try:
+            event = log.apply(state, name, payload)
+        except (AssertionError, ValueError):
+            continue
+        start = time.perf_counter()
+        log.record(state, event)
+        saves.append(time.perf_counter() - start)
+    log.close()
+
+    def restore():
+        restored = EventLog(path)
+        restored.open(new_game)
+        restored.close()
+
+    return saves, timed(restore)
+
+
+def pickle_files(directory: str) -> tuple:
+    """dump the state to a new file after every command, and load the last one
+
+    Args:
+        directory (str): the saves directory
+
+    Returns:
+        tuple: the save and restore times
+    """
+    state = new_game()
+    saves = []
+    path = None
+    for i, (name, payload) in enumerate(commands()):
+        try:
+            apply_command(state, name, payload, time.monotonic_ns())
+        except (AssertionError, ValueError):
+            continue
+        path = os.path.join(directory, f"{i}.{name.replace('/', '_')}.pkl")
+        start = time.perf_counter()
+        with open(path, "wb") as f:
+            pickle.dump(state, f)
+        saves.append(time.perf_counter() - start)
+
+    def restore():
+        with open(path, "rb") as f:
+            pickle.load(f)
+
+    return saves, timed(restore)
+
+
+def main():
+    """save and restore the game both ways"""
+    print(
+        f"a checkpoint every {CHECKPOINT_INTERVAL} commands, "
+        f"a full one every {FULL_CHECKPOINT_INTERVAL}"
+    )
+    for label, run in (("event log", event_log), ("pickle files", pickle_files)):
+        with tempfile.TemporaryDirectory() as directory:
+            saves, restores = run(directory)
+            size, allocated = disk_usage(directory)
+        print(f"{label}: {len(saves)} saves")
+        print(f"  save:    {percentiles(saves)}")
+        print(f"  restore: {percentiles(restores)}")
+        print(f"  on disk: {size} bytes in files, {allocated} bytes allocated")
+
+
+if __name__ == "__main__":
+    main()
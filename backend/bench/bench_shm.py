@@ -0,0 +1,126 @@
+"""Benchmark of the time from a buzz press to the state published with it
+
+Starts the server with uvicorn and the shared memory ring, like
+BUZZ_TRANSPORT=shm does. A second process stands in for buzz.py and
+pushes presses stamped with the monotonic clock, each one in an
+arbitration window of its own. The time is taken from PressRing.push to
+the end of the publish of the state the press was applied to, through
+the ring, the arbiter and GameState.buzz. The same presses posted to
+/buzz are shown for comparison, timed from before the request.
+
+    python backend/bench/bench_shm.py
+"""
+
+import subprocess
+import sys
+import time
+from common import percentiles, serve
+
+# pylint: disable=wrong-import-order
+import requests
+import server
+from arbiter import BUZZ_ARBITRATION_WINDOW
+from buzz_interface import Buzz
+from shm import SHM_POLL_INTERVAL, PressRing
+
+NAME = "jeopardy-bench"
+PRESSES = 200
+# presses further apart than the window are arbitrated one at a time
+SPACING = BUZZ_ARBITRATION_WINDOW + 0.01
+
+
+def produce():
+    """push the presses, each in a window of its own"""
+    ring = PressRing(NAME)
+    for i in range(PRESSES):
+        while not ring.push(i % 16, "red", time.monotonic_ns()):
+            time.sleep(SHM_POLL_INTERVAL)
+        time.sleep(SPACING)
+    ring.close()
+
+
+class Probe:
+    """Class to time the presses until the state they were applied to is published"""
+
+    def __init__(self):
+        # time each press waiting to be published was made, in nanoseconds
+        self.pending: list[int] = []
+        self.latencies: list[float] = []
+        self.publish_state = server.publish_state
+        self.apply_presses = server.apply_presses
+
+    async def apply(self, run_command, presses: list):
+        """apply the presses of a window, keeping the time they were pressed
+
+        Args:
+            run_command (Callable[[str, dict], Awaitable[None]]): applies a command
+            presses (list): the presses
+        """
+        self.pending.extend(press["at"] for press in presses)
+        await self.apply_presses(run_command, presses)
+
+    async def publish(self):
+        """publish the state and time the presses applied to it"""
+        await self.publish_state()
+        now = time.monotonic_ns()
+        self.latencies.extend((now - at) / 1e9 for at in self.pending)
+        self.pending.clear()
+
+    def wait(self, count: int):
+        """wait for a number of presses to be published
+
+        Args:
+            count (int): the number of presses
+        """
+        while len(self.latencies) < count:
+            time.sleep(0.01)
+
+
+def post(port: int, probe: Probe):
+    """post the presses to /buzz one at a time
+
+    Args:
+        port (int): the port of the server
+        probe (Probe): the probe timing the presses
+    """
+    with requests.Session() as session:
+        for i in range(PRESSES):
+            probe.pending.append(time.monotonic_ns())
+            session.post(
+                f"http://127.0.0.1:{port}/buzz",
+                json={"controller": i % 16, "color": "red"},
+                timeout=5,
+            ).raise_for_status()
+            probe.wait(i + 1)
+            time.sleep(SPACING)
+
+
+def main():
+    """run the server and send the presses through the ring, then over HTTP"""
+    probe = Probe()
+    server.publish_state = probe.publish
+    server.apply_presses = probe.apply
+    server.app.my_ring = PressRing(NAME, create=True)
+    Buzz.ring = server.app.my_ring
+    try:
+        with serve() as port:
+            # a process of its own, like buzz.py, not sharing the resource tracker
+            with subprocess.Popen([sys.executable, __file__, "produce"]):
+                probe.wait(PRESSES)
+            ring, probe.latencies = probe.latencies, []
+            post(port, probe)
+            posted = probe.latencies
+    finally:
+        server.app.my_ring.close()
+
+    print(f"arbitration window {BUZZ_ARBITRATION_WINDOW * 1e3:.0f} ms")
+    print(f"poll interval {SHM_POLL_INTERVAL * 1e3:.1f} ms")
+    print(f"ring, pushed to published: {percentiles(ring)}")
+    print(f"/buzz, posted to published: {percentiles(posted)}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["produce"]:
+        produce()
+    else:
+        main()
@@ -0,0 +1,108 @@
+"""Benchmark of building and encoding the state that is published
+
+Times GameState.to_dict and its encoding with the memoized dictionaries
+dropped (cold) and kept (warm), and the views of the GET endpoints built
+from scratch or from the views published before, when nothing changed.
+Runs on the board in backend/questions.json and on a generated board of
+500 questions.
+
+    python backend/bench/bench_state.py
+"""
+
+import json
+import os
+import pickle
+import tempfile
+import time
+from common import new_game, play, summary
+
+# pylint: disable=wrong-import-order
+from broadcast import encode
+from views import StateViews
+
+ROUNDS = 200
+
+
+def generated_board(directory: str, questions: int):
+    """write a board with the given number of questions, in categories of five
+
+    Args:
+        directory (str): where to write backend/questions.json
+        questions (int): the number of questions
+    """
+    with open("backend/questions.json", "r", encoding="utf-8") as f:
+        tiebreaker = json.load(f)["tiebreaker"]
+    regular = {
+        f"Category {c}": [
+            {
+                "question": f"Question {c}.{v} " + "lorem ipsum " * 8,
+                "answer": f"Answer {c}.{v}",
+                "image": "",
+                "value": 100 * (v + 1),
+            }
+            for v in range(5)
+        ]
+        for c in range(questions // 5)
+    }
+    os.makedirs(f"{directory}/backend")
+    with open(f"{directory}/backend/questions.json", "w", encoding="utf-8") as f:
+        json.dump({"regular": regular, "tiebreaker": tiebreaker}, f)
+
+
+def measure(label: str, state):
+    """time the state and the views of a game
+
+    Args:
+        label (str): the name of the board
+        state (GameState): the game state
+    """
+    cold, warm = [], []
+    for _ in range(ROUNDS):
+        copy = pickle.loads(pickle.dumps(state))
+        start = time.perf_counter()
+        encode(copy.to_dict())
+        cold.append(time.perf_counter() - start)
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        encode(state.to_dict())
+        warm.append(time.perf_counter() - start)
+
+    views = StateViews(state)
+    fresh, reused = [], []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        StateViews(state)
+        fresh.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        views = StateViews(state, views)
+        reused.append(time.perf_counter() - start)
+
+    print(f"{label}:")
+    print(f"  to_dict and encode, cold: {summary(cold)}")
+    print(f"  to_dict and encode, warm: {summary(warm)}")
+    print(f"  views from scratch:       {summary(fresh)}")
+    print(f"  views from the previous:  {summary(reused)}")
+
+
+def main():
+    """run the benchmark on both boards"""
+    state = new_game()
+    for _ in play(state, 5):
+        pass
+    measure(f"{len(state.list_questions())} questions", state)
+
+    with tempfile.TemporaryDirectory() as directory:
+        generated_board(directory, 500)
+        root = os.getcwd()
+        os.chdir(directory)
+        try:
+            state = new_game()
+        finally:
+            os.chdir(root)
+    for _ in play(state, 5):
+        pass
+    measure(f"{len(state.list_questions())} questions", state)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Helpers shared by the benchmark scripts
+
+Every script is run from the root of the repository, like the server:
+
+    python backend/bench/bench_<name>.py
+"""
+
+from contextlib import contextmanager
+from threading import Thread
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.chdir(os.path.dirname(BACKEND))
+
+# pylint: disable=wrong-import-position
+import uvicorn
+from buzz_interface import Buzz
+from saves import EventLog
+from stubs import Lights, new_game
+import server
+import views
+
+# the lights the games want are kept instead of sent to the bridge
+Buzz.ring = Lights()
+
+
+def summary(samples: list) -> str:
+    """describe the median and the 95th percentile of the samples
+
+    Args:
+        samples (list): the times measured, in seconds
+
+    Returns:
+        str: the summary, in the unit that fits the median
+    """
+    median = statistics.median(samples)
+    p95 = sorted(samples)[int(len(samples) * 0.95)]
+    return f"median {duration(median)}, p95 {duration(p95)}"
+
+
+def percentiles(samples: list) -> str:
+    """describe the median and the 99th percentile of the samples
+
+    Args:
+        samples (list): the times measured, in seconds
+
+    Returns:
+        str: the summary, in the unit that fits each percentile
+    """
+    ordered = sorted(samples)
+    p99 = ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)]
+    return f"p50 {duration(statistics.median(ordered))}, p99 {duration(p99)}"
+
+
+def duration(seconds: float) -> str:
+    """format a duration
+
+    Args:
+        seconds (float): the duration, in seconds
+
+    Returns:
+        str: the duration, in the unit that fits it
+    """
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} us"
+
+
+def free_port() -> int:
+    """find a port nothing listens on
+
+    Returns:
+        int: the port
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def serve():
+    """run the server with a new game and its own event log, with uvicorn in
+    a thread, until the block ends
+
+    Yields:
+        int: the port the server listens on
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        app = server.app
+        app.my_log = EventLog(f"{directory}/saves.db")
+        app.my_state = app.my_log.open(new_game)
+        app.my_views = views.StateViews(app.my_state)
+        server.publish_roles(app.my_state.to_dict())
+
+        port = free_port()
+        config = uvicorn.Config(app, port=port, ws="websockets", log_level="warning")
+        uvicorn_server = uvicorn.Server(config)
+        thread = Thread(target=uvicorn_server.run, daemon=True)
+        thread.start()
+        while not uvicorn_server.started:
+            time.sleep(0.01)
+        try:
+            yield port
+        finally:
+            uvicorn_server.should_exit = True
+            thread.join()
+            app.my_log.close()
+
+
+def play(state, questions: int):
+    """play the first questions of the board, each team buzzing in turn
+
+    Args:
+        state (GameState): the game state
+        questions (int): the number of questions to play
+
+    Yields:
+        GameState: the game state after every command
+    """
+    teams = len(state.list_teams())
+    for idx in range(questions):
+        for command, args in (
+            (state.select_question, (idx,)),
+            (state.set_answering, ()),
+            (state.buzz, (idx % teams, "red")),
+            (state.answer_question, (idx % 4 != 0,)),
+        ):
+            try:
+                command(*args)
+            except (AssertionError, ValueError):
+                continue
+            state.reset_sound()
+            yield state
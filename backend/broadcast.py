@@ -0,0 +1,185 @@
+"""Module responsable for broadcasting messages to the websocket clients"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Callable
+from fastapi import WebSocket
+from tasks import spawn
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CLIENT_SEND_TIMEOUT = float(os.getenv("CLIENT_SEND_TIMEOUT", "2"))
+CLIENT_QUEUE_SIZE = int(os.getenv("CLIENT_QUEUE_SIZE", "32"))
+CLIENT_MAX_STRIKES = int(os.getenv("CLIENT_MAX_STRIKES", "3"))
+
+
+def encode(message: dict) -> str:
+    """encode a message into a text frame, using orjson when it is installed
+
+    Args:
+        message (dict): the message to encode
+
+    Returns:
+        str: the encoded frame
+    """
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class Client:
+    """A websocket client with its own outbound queue and writer task"""
+
+    def __init__(
+        self, ws: WebSocket, broadcaster: "Broadcaster", protocol: str, role: str
+    ):
+        """Initialize the client
+
+        Args:
+            ws (WebSocket): the accepted websocket connection
+            broadcaster (Broadcaster): the broadcaster the client belongs to
+            protocol (str): the state protocol the client speaks
+            role (str): the view of the state the client receives
+        """
+        self.ws = ws
+        self.protocol = protocol
+        self.role = role
+        self.broadcaster = broadcaster
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.strikes = 0
+        self.task = asyncio.create_task(self.__writer())
+
+    def push(self, frame: str | Callable[[], str]) -> bool:
+        """queue an encoded frame to be sent to the client
+
+        A callable is called by the writer right before sending, for frames
+        that carry the time they are sent.
+
+        Args:
+            frame (str | Callable[[], str]): the frame to send, or a function encoding it
+
+        Returns:
+            bool: the message was queued, False if the client queue is full
+        """
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def __writer(self):
+        """send the queued messages one at a time, within the send deadline"""
+        while True:
+            frame = await self.queue.get()
+            if callable(frame):
+                frame = frame()
+            try:
+                await asyncio.wait_for(self.ws.send_text(frame), CLIENT_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.strikes += 1
+                logging.warning(
+                    "Websocket client timed out (%d/%d)",
+                    self.strikes,
+                    CLIENT_MAX_STRIKES,
+                )
+                if self.strikes >= CLIENT_MAX_STRIKES:
+                    self.broadcaster.evict(self)
+                    return
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logging.info("Websocket client failed: %s", e)
+                self.broadcaster.evict(self)
+                return
+            else:
+                self.strikes = 0
+
+    async def close(self):
+        """stop the writer task and close the connection"""
+        self.task.cancel()
+        try:
+            await asyncio.wait_for(self.ws.close(), CLIENT_SEND_TIMEOUT)
+        except Exception:  # pylint: disable=broad-exception-caught
+            pass
+
+
+class Broadcaster:
+    """Class to send messages to every websocket client concurrently"""
+
+    def __init__(self):
+        self.clients: dict[WebSocket, Client] = {}
+        # evicted clients being closed
+        self.closing: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    def connect(
+        self, ws: WebSocket, protocol: str, role: str, hello: str | None = None
+    ) -> Client:
+        """register an accepted websocket
+
+        Args:
+            ws (WebSocket): the accepted websocket connection
+            protocol (str): the state protocol the client speaks
+            role (str): the view of the state the client receives
+            hello (str|None): encoded frame to send first to the client
+
+        Returns:
+            Client: the registered client
+        """
+        client = Client(ws, self, protocol, role)
+        if hello is not None:
+            client.push(hello)
+        self.clients[ws] = client
+        return client
+
+    def disconnect(self, ws: WebSocket):
+        """unregister a websocket that was closed by the other side
+
+        Args:
+            ws (WebSocket): the websocket connection
+        """
+        client = self.clients.pop(ws, None)
+        if client is not None:
+            client.task.cancel()
+
+    def evict(self, client: Client):
+        """drop a client that is too slow or whose connection is dead
+
+        Args:
+            client (Client): the client to drop
+        """
+        if self.clients.get(client.ws) is not client:
+            return
+        logging.warning("Evicting websocket client")
+        del self.clients[client.ws]
+        spawn(self.closing, client.close())
+
+    def get(self, ws: WebSocket) -> Client | None:
+        """get the client of a websocket
+
+        Args:
+            ws (WebSocket): the websocket connection
+
+        Returns:
+            Client | None: the client, None if it was dropped
+        """
+        return self.clients.get(ws)
+
+    def broadcast(self, frames: dict[str, dict[str, str]]):
+        """queue the already encoded frame of each role and protocol for every
+        client without waiting for the sends, clients of a protocol without a
+        frame are skipped
+
+        Args:
+            frames (dict[str, dict[str, str]]): the frame to send for each
+                protocol, by role
+        """
+        for client in list(self.clients.values()):
+            frame = frames[client.role].get(client.protocol)
+            if frame is not None and not client.push(frame):
+                self.evict(client)
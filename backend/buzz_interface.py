@@ -1,11 +1,42 @@
+# pylint: disable=too-many-instance-attributes
 """ This module is responsible for interfacing with the buzz controller """
 
+from threading import Condition, Thread
 from typing import List
+import logging
+import os
+import secrets
+import time
 import requests
 
+LIGHTS_TIMEOUT = float(os.getenv("LIGHTS_TIMEOUT", "1"))
+LIGHTS_RECONCILE_INTERVAL = float(os.getenv("LIGHTS_RECONCILE_INTERVAL", "2"))
+LIGHTS_BREAKER_THRESHOLD = int(os.getenv("LIGHTS_BREAKER_THRESHOLD", "3"))
+LIGHTS_BREAKER_MAX_BACKOFF = float(os.getenv("LIGHTS_BREAKER_MAX_BACKOFF", "30"))
+ANIMATION_PERIOD = float(os.getenv("ANIMATION_PERIOD", "0.5"))
+
 
 class Buzz:
-    """Class to interface with the buzz controller"""
+    """Class to interface with the buzz controller
+
+    Turning lights on or off only updates the wanted light mask, a background
+    thread sends it to the controller over a persistent connection. Changes
+    made while a request is in flight are merged, only the final mask is sent.
+
+    Every mask has a version, so the controller can ignore stale updates, and
+    it is sent again every LIGHTS_RECONCILE_INTERVAL seconds to fix lights that
+    got out of sync. After LIGHTS_BREAKER_THRESHOLD failures in a row the
+    controller is left alone, and only retried with an exponential backoff.
+
+    When the controllers process runs on the same machine, the mask is written
+    to the shared memory ring instead, see the shm module.
+
+    An animation can be sent along with the mask, the controllers process
+    plays it on its own, it overrides the mask on the controllers it uses.
+    """
+
+    # shared memory ring to send the mask through instead of HTTP
+    ring = None
 
     def __init__(self, host: str, controller_port: str):
         """Initialize the Buzz class
@@ -14,30 +45,236 @@ class Buzz:
             controller_port (str): the port to contact to turn lights
         """
         self.url = f"http://{host}:{controller_port}"
+        self.muted = False
+        self.mask = 0
+        self.animation: dict | None = None
+        self.__setup()
+
+    def __setup(self):
+        self.condition = Condition()
+        self.session_id = secrets.token_hex(4)
+        self.version = 0
+        self.sent: int | None = None
+        self.changed_at: int | None = None
+        self.failures = 0
+        self.retry_at: float | None = None
+        self.reconcile_at = 0.0
+        self.thread: Thread | None = None
+        self.closed = False
+        self.metrics = {
+            "sent": 0,
+            "failed": 0,
+            "merged": 0,
+            "last_ms": 0.0,
+            "max_ms": 0.0,
+            "total_ms": 0.0,
+        }
+
+    def __getstate__(self) -> dict:
+        return {
+            "url": self.url,
+            "muted": self.muted,
+            "mask": self.mask,
+            "animation": self.animation,
+        }
+
+    def __setstate__(self, state: dict):
+        self.url = state["url"]
+        self.muted = state.get("muted", False)
+        self.mask = state.get("mask", 0)
+        self.animation = state.get("animation")
+        self.__setup()
+
+    def __update_mask(self, on: int, off: int):
+        """change the wanted light mask and wake up the sender
+
+        Args:
+            on (int): mask of the lights to turn on
+            off (int): mask of the lights to turn off
+        """
+        with self.condition:
+            self.mask = (self.mask | on) & ~off
+            self.__changed()
+
+    def __changed(self):
+        """send the new wanted lights, must hold the condition"""
+        if self.changed_at is not None:
+            self.metrics["merged"] += 1
+        self.version += 1
+        if self.muted or self.closed:
+            return
+        if self.ring is not None:
+            self.ring.set_lights(self.mask, self.animation)
+            self.sent = self.mask
+            self.metrics["sent"] += 1
+            return
+        if self.changed_at is None:
+            self.changed_at = time.perf_counter_ns()
+        if self.thread is None:
+            self.thread = Thread(target=self.__run, name="buzz-lights", daemon=True)
+            self.thread.start()
+        self.condition.notify()
+
+    def resync(self):
+        """send the wanted lights again, after being muted or restored"""
+        with self.condition:
+            self.__changed()
+
+    def close(self):
+        """stop sending the wanted lights, when this game state is replaced"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
 
     def turn_light_on(self, controllers: List[int]):
         """Turn the lights of the given controllers on
 
         Args:
             controllers (List[int]): controllers
-
-        Raises:
-            Exception: Error turning light on
         """
-        url = f"{self.url}/on"
-        response = requests.post(url, json={"controllers": controllers}, timeout=10)
-        if response.status_code != 200:
-            raise ConnectionError(f"Error turning light on: {response.text}")
+        self.__update_mask(sum(1 << c for c in set(controllers)), 0)
 
     def turn_light_off(self, controllers: List[int]):
         """Turn the lights of the given controllers off
 
         Args:
             controllers (List[int]): controllers
+        """
+        self.__update_mask(0, sum(1 << c for c in set(controllers)))
+
+    def turn_other_lights_off(self, controllers: List[int]):
+        """Turn the lights of every controller but the given ones off
+
+        Args:
+            controllers (List[int]): controllers to leave as they are
+        """
+        self.__update_mask(0, ~sum(1 << c for c in set(controllers)))
+
+    def animate(
+        self,
+        pattern: str | None,
+        controllers: List[int] | None = None,
+        period: float = ANIMATION_PERIOD,
+    ):
+        """Play an animation on the lights of the given controllers, replacing
+        the one playing
+
+        Args:
+            pattern (str | None): "blink", "chase" or "flash", None to stop
+            controllers (List[int] | None, optional): controllers. Defaults to None.
+            period (float, optional): seconds of a cycle. Defaults to ANIMATION_PERIOD.
+        """
+        animation = None
+        if pattern is not None:
+            animation = {
+                "pattern": pattern,
+                "mask": sum(1 << c for c in set(controllers or [])),
+                "period": period,
+            }
+        with self.condition:
+            if animation == self.animation:
+                return
+            self.animation = animation
+            self.__changed()
+
+    def __wait(self) -> bool:
+        """wait until the mask must be sent, must hold the condition
+
+        Returns:
+            bool: the controller is being probed after the breaker opened
+        """
+        while True:
+            now = time.monotonic()
+            if self.closed:
+                return False
+            if self.retry_at is not None:
+                if now >= self.retry_at:
+                    return True
+                self.condition.wait(self.retry_at - now)
+            elif self.changed_at is not None or now >= self.reconcile_at:
+                return False
+            else:
+                self.condition.wait(self.reconcile_at - now)
+
+    def __failed(self, error: Exception, probe: bool):
+        """count a failed update and open the breaker, must hold the condition
+
+        Args:
+            error (Exception): the error of the update
+            probe (bool): the update was a probe of an open breaker
+        """
+        self.failures += 1
+        self.metrics["failed"] += 1
+        if self.failures < LIGHTS_BREAKER_THRESHOLD:
+            logging.error("Failed to update buzz lights: %s", error)
+            return
+        if not probe:
+            logging.error("Buzz lights unreachable, backing off: %s", error)
+        backoff = min(
+            LIGHTS_TIMEOUT * 2 ** (self.failures - LIGHTS_BREAKER_THRESHOLD),
+            LIGHTS_BREAKER_MAX_BACKOFF,
+        )
+        self.retry_at = time.monotonic() + backoff
+
+    def __run(self):
+        """send the wanted light mask when it changes and periodically"""
+        session = requests.Session()
+        while True:
+            with self.condition:
+                probe = self.__wait()
+                if self.closed:
+                    break
+                mask, version, changed_at = self.mask, self.version, self.changed_at
+                animation = self.animation
+                self.changed_at = None
+
+            try:
+                response = session.post(
+                    f"{self.url}/lights",
+                    json={
+                        "mask": mask,
+                        "version": version,
+                        "session": self.session_id,
+                        "animation": animation,
+                    },
+                    timeout=LIGHTS_TIMEOUT,
+                )
+                if response.status_code != 200:
+                    raise ConnectionError(f"Error setting lights: {response.text}")
+            except (requests.RequestException, ConnectionError) as e:
+                with self.condition:
+                    if self.changed_at is None:
+                        self.changed_at = changed_at
+                    self.__failed(e, probe)
+                continue
+
+            with self.condition:
+                if self.retry_at is not None:
+                    logging.info("Buzz lights reachable again")
+                self.sent = mask
+                self.failures = 0
+                self.retry_at = None
+                self.reconcile_at = time.monotonic() + LIGHTS_RECONCILE_INTERVAL
+                if changed_at is not None:
+                    elapsed = (time.perf_counter_ns() - changed_at) / 1e6
+                    self.metrics["sent"] += 1
+                    self.metrics["last_ms"] = elapsed
+                    self.metrics["max_ms"] = max(self.metrics["max_ms"], elapsed)
+                    self.metrics["total_ms"] += elapsed
+        session.close()
+
+    def stats(self) -> dict:
+        """report the light commands sent and how long they took
 
-        Raises:
-            Exception: Error turning light off
+        Returns:
+            dict: the number of sent, failed and merged updates and their latency
         """
-        url = f"{self.url}/off"
-        response = requests.post(url, json={"controllers": controllers}, timeout=10)
-        print(response.status_code)
+        with self.condition:
+            metrics = dict(self.metrics)
+            metrics["mask"] = self.mask
+            metrics["version"] = self.version
+            metrics["synced"] = self.sent == self.mask
+            metrics["breaker_open"] = self.retry_at is not None
+        total = metrics.pop("total_ms")
+        metrics["avg_ms"] = total / metrics["sent"] if metrics["sent"] else 0.0
+        return metrics
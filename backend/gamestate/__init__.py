@@ -4,6 +4,7 @@ from .questions_controller import QuestionsController
 from .teams_controller import TeamsController
 from .actions import Actions
 from .gamestate import GameState
+from .commands import COMMANDS, apply_command
 from .models import Team, Question
 
 __all__ = [
@@ -11,6 +12,8 @@ __all__ = [
     "TeamsController",
     "Actions",
     "GameState",
+    "COMMANDS",
+    "apply_command",
     "Team",
     "Question",
 ]
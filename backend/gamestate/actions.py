@@ -3,8 +3,10 @@
     This module contains the Actions class which is used to control the actions of the game
 """
 
+from .models import Memoized, memoized
 
-class Actions:
+
+class Actions(Memoized):
     """Class for controling actions atributes withtin the game"""
 
     def __init__(self):
@@ -40,6 +42,7 @@ class Actions:
         """reset the countdown timer"""
         self.stop_countdown = False
 
+    @memoized
     def to_dict(self) -> dict:
         """
             cast the state as a dictionary to represent as json object
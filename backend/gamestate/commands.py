@@ -0,0 +1,45 @@
+""" Module with the commands that change the game state """
+
+from typing import Callable, Dict
+from .gamestate import GameState
+
+COMMANDS: Dict[str, Callable[[GameState, dict], None]] = {
+    "answer": lambda state, p: state.answer_question(p["correct"]),
+    "skip": lambda state, _: state.skip_question(),
+    "question": lambda state, p: state.select_question(p["id"]),
+    "teams": lambda state, p: state.set_teams(p["teams"]),
+    "buzz": lambda state, p: state.buzz(p["controller"], p["color"], p.get("at")),
+    "buzz_start": lambda state, _: state.set_answering(),
+    "show_tiebreaker_question": lambda state, _: state.show_tiebreaker_question(),
+    "stop_timer": lambda state, _: state.stop_countdown_timer(),
+    "show_sos": lambda state, _: state.show_sos(),
+    "show_tiebreaker": lambda state, _: state.show_tiebreaker(),
+    "end": lambda state, _: state.end_game(),
+    "play_walkin": lambda state, _: state.change_walkin(True),
+    "stop_walkin": lambda state, _: state.change_walkin(False),
+    "fix/points": lambda state, p: state.add_points(p["team_id"], p["points"]),
+    "fix/state": lambda state, p: state.set_state(p["state"]),
+    "fix/selecting": lambda state, p: state.set_selecting(p["team_id"]),
+    "expire": lambda state, p: state.expire(p["timers"]),
+}
+
+
+def apply_command(state: GameState, name: str, payload: dict, at: int):
+    """apply a command to the game state as if it happened at the given time
+
+    Args:
+        state (GameState): the game state
+        name (str): the name of the command
+        payload (dict): the arguments of the command
+        at (int): the time the command happened, in nanoseconds
+
+    Raises:
+        ValueError: the command does not exist
+    """
+    if name not in COMMANDS:
+        raise ValueError(f"Unknown command {name}")
+    state.now = at
+    try:
+        COMMANDS[name](state, payload)
+    finally:
+        state.now = None
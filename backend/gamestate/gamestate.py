@@ -2,21 +2,20 @@
 """Module responsable for storing the state of the game"""
 
 from enum import Enum
-from threading import Thread
-from typing import List
+from typing import Dict, List
 import os
 import time
 import logging
 from buzz_interface import Buzz
-from requests.exceptions import ConnectionError as requests_ConnectionError
 from .questions_controller import QuestionsController
-from .teams_controller import TeamsController
+from .teams_controller import MAX_TEAMS, TeamsController
 from .actions import Actions
 from .models import Team, Question
 
 SPLIT_OR_STEAL = bool(os.getenv("USE_SPLIT_OR_STEAL", "True"))
-BUZZ_PENALTY_TIMEOUT = int(os.getenv("BUZZ_PENALTY_TIMEOUT", "5")) * 1e9
+BUZZ_PENALTY_TIMEOUT = int(os.getenv("BUZZ_PENALTY_TIMEOUT", "5")) * 1_000_000_000
 TIME_TO_PRESS_BUTTON = int(os.getenv("TIME_TO_PRESS_BUTTON", "8"))
+ANSWER_WINDOW = TIME_TO_PRESS_BUTTON * 1_000_000_000
 
 
 class States(Enum):
@@ -34,6 +33,11 @@ class States(Enum):
 class GameState:
     """Class to store the state of the game"""
 
+    # time of the command being applied, used instead of the clock when replaying
+    now: int | None = None
+    # time buzzing opened, presses stamped before it are too early
+    reading_since: int = 0
+
     def __init__(self, buzz_host: str, buzz_port: int):
         self.questions_controller = QuestionsController()
         self.teams_controller = TeamsController()
@@ -47,8 +51,112 @@ class GameState:
         self.controllers = Buzz(buzz_host, buzz_port)
         self.reading = False
         self.__set_reading(False)
-        self.reading_until = time.time_ns()
-        self.timeouts = [time.time_ns()] * 4
+        self.reading_until = self.__time()
+        self.timeouts = [self.__time()] * MAX_TEAMS
+        # deadlines still to fire, see deadlines
+        self.answer_deadline: int | None = None
+        self.lockouts: Dict[int, int] = {}
+        # end of the countdown of the team answering, only shown by the clients
+        self.countdown_deadline: int | None = None
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.__dict__.setdefault("answer_deadline", None)
+        self.__dict__.setdefault("lockouts", {})
+        self.__dict__.setdefault("countdown_deadline", None)
+
+    def __time(self) -> int:
+        """get the current time, or the time of the command being applied
+
+        Returns:
+            int: the monotonic time in nanoseconds
+        """
+        return self.now if self.now is not None else time.monotonic_ns()
+
+    def deadlines(self) -> Dict[str, int]:
+        """list the deadlines that are still to fire
+
+        Returns:
+            Dict[str, int]: monotonic time in nanoseconds of each deadline, by name
+        """
+        deadlines = {
+            f"penalty/{controller}": deadline
+            for controller, deadline in self.lockouts.items()
+        }
+        if self.answer_deadline is not None:
+            deadlines["answer"] = self.answer_deadline
+        return deadlines
+
+    def expire(self, names: List[str]):
+        """action for deadlines being reached, a deadline that was moved later
+        after the expiry was queued is left to fire again
+
+        Args:
+            names (List[str]): names of the deadlines, as given by deadlines
+        """
+        now = self.__time()
+        for name in names:
+            if name == "answer":
+                if self.answer_deadline is None or self.answer_deadline > now:
+                    continue
+                self.answer_deadline = None
+                if self.state == States.ANSWERING_QUESTION:
+                    logging.info("ANSWER TIME OVER")
+                    self.controllers.turn_other_lights_off([])
+                    self.controllers.animate(None)
+            elif name.startswith("penalty/"):
+                controller = int(name.split("/")[1])
+                deadline = self.lockouts.get(controller)
+                if deadline is None or deadline > now:
+                    continue
+                del self.lockouts[controller]
+                logging.info("PENALTY OVER: %d", controller)
+                if (
+                    self.state == States.ANSWERING_QUESTION
+                    and self.answer_deadline is not None
+                    and controller in self.__get_teams_allowed_to_play()
+                ):
+                    self.controllers.turn_light_on([controller])
+                    self.controllers.animate("chase", self.__get_teams_ready())
+
+    def reset_deadlines(self):
+        """bring the deadlines back to the clock after restoring a save,
+        deadlines from before the machine restarted are reached right away
+        """
+        now = time.monotonic_ns()
+
+        def clamp(deadline: int, duration: int) -> int:
+            return now if deadline > now + duration else deadline
+
+        self.reading_since = min(self.reading_since, now)
+        self.reading_until = clamp(self.reading_until, ANSWER_WINDOW)
+        if self.answer_deadline is not None:
+            self.answer_deadline = clamp(self.answer_deadline, ANSWER_WINDOW)
+        self.timeouts = [clamp(t, BUZZ_PENALTY_TIMEOUT) for t in self.timeouts]
+        self.lockouts = {
+            c: clamp(t, BUZZ_PENALTY_TIMEOUT) for c, t in self.lockouts.items()
+        }
+        if self.countdown_deadline is not None:
+            tta = self.questions_controller.get_current_question().time_to_answer
+            self.countdown_deadline = clamp(
+                self.countdown_deadline, tta * 1_000_000_000
+            )
+
+    def published_deadlines(self) -> Dict[str, float | None]:
+        """the deadlines the clients show, in milliseconds of the monotonic
+        clock of the server, small enough to be exact javascript numbers
+
+        Returns:
+            Dict[str, float | None]: end of the answer window and of the countdown
+        """
+
+        def milliseconds(deadline: int | None) -> float | None:
+            return deadline / 1_000_000 if deadline is not None else None
+
+        return {
+            "answer": milliseconds(self.answer_deadline),
+            "countdown": milliseconds(self.countdown_deadline),
+        }
 
     def set_state(self, state: int):
         """set the state of the game
@@ -69,6 +177,9 @@ class GameState:
     def __game_over(self):
         self.state = States.OVER
         self.actions.play_end_sound = True
+        winner = self.teams_controller.get_winning_team()
+        if winner is not None:
+            self.controllers.animate("flash", [winner.id])
 
     def get_current_team(self) -> Team:
         """return the team playing
@@ -114,7 +225,11 @@ class GameState:
         """
         logging.debug("Set %d as team playing", team_idx)
         self.reading = False
-        self.controllers.turn_light_off(list({0, 1, 2, 3} - {team_idx}))
+        self.answer_deadline = None
+        tta = self.questions_controller.get_current_question().time_to_answer
+        self.countdown_deadline = self.__time() + tta * 1_000_000_000
+        self.controllers.turn_other_lights_off([team_idx])
+        self.controllers.animate("blink", [team_idx])
 
         self.controllers_used_in_current_question.append(team_idx)
         self.teams_controller.set_current_playing(team_idx)
@@ -155,11 +270,11 @@ class GameState:
             l.append(self.sos_steal[i] if i in self.sos_steal else None)
         return l
 
-    def __handle_normal_buzz(self, controller: int, color: str):
+    def __handle_normal_buzz(self, controller: int, color: str, pressed_at: int):
         if color == "red":
-            if self.reading:
-                if self.reading_until >= time.time_ns():
-                    if self.timeouts[controller] >= time.time_ns():
+            if self.reading and pressed_at >= self.reading_since:
+                if self.reading_until >= pressed_at:
+                    if self.timeouts[controller] >= pressed_at:
                         logging.info("TIMEOUT")
                     else:
                         self.__set_current_team(controller)
@@ -167,7 +282,8 @@ class GameState:
                     logging.info("OUT OF TIME")
             else:
                 logging.info("NOT READING")
-                self.timeouts[controller] = time.time_ns() + BUZZ_PENALTY_TIMEOUT
+                self.timeouts[controller] = pressed_at + BUZZ_PENALTY_TIMEOUT
+                self.lockouts[controller] = self.timeouts[controller]
 
     def __handle_sos_buzz(self, controller: int, color: str):
         if self.reading:
@@ -183,20 +299,25 @@ class GameState:
         else:
             logging.info("NOT READING")
 
-    def buzz(self, controller: int, color: str):
+    def buzz(self, controller: int, color: str, pressed_at: int | None = None):
         """action for a team buzzing
 
         Args:
             controller (int): the id of the controller
             color (str): color pressed
+            pressed_at (int | None, optional): time the button was pressed, in
+                nanoseconds, the rules are checked against it instead of the
+                current time. Defaults to None.
         """
         logging.info("BUZZ: %d %s", controller, color)
+        now = self.__time()
+        pressed_at = now if pressed_at is None else min(pressed_at, now)
 
         if self.__team_allowed_to_play(controller):
             if self.state == States.SPLIT_OR_STEAL:
                 self.__handle_sos_buzz(controller, color)
             else:
-                self.__handle_normal_buzz(controller, color)
+                self.__handle_normal_buzz(controller, color, pressed_at)
 
     def select_question(self, identifier: int):
         """select a new question
@@ -240,43 +361,28 @@ class GameState:
 
     def __set_reading(self, value: bool):
         self.reading = value
-        try:
-            if value:
-                self.controllers.turn_light_on(self.__get_teams_allowed_to_play())
-            else:
-                self.controllers.turn_light_off([0, 1, 2, 3])
-        except requests_ConnectionError:
-            logging.error("Failed to connect to buzz controllers")
-
-    def __question_timeout_manage_lights(self, reading_until: int, sleep_time: int):
-        """manage the lights when a question times out
-
-        Args:
-            starting_time (int): the time the question started
-            tta (int): the time to answer the question
-        """
-
-        def question_timeout():
-            time.sleep(sleep_time)
-            if (
-                self.reading_until == reading_until
-                and self.state == States.READING_QUESTION
-            ):
-                self.controllers.turn_light_off([0, 1, 2, 3])
-
-        Thread(target=question_timeout, args=()).start()
+        if value:
+            self.controllers.turn_light_on(self.__get_teams_allowed_to_play())
+        else:
+            self.answer_deadline = None
+            self.countdown_deadline = None
+            self.controllers.turn_other_lights_off([])
+            if self.state != States.OVER:
+                self.controllers.animate(None)
 
     def set_answering(self):
         """set the state as people can answer"""
         logging.debug("Waiting for answer")
         if self.state != States.SPLIT_OR_STEAL:
             self.state = States.ANSWERING_QUESTION
-            self.reading_until = time.time_ns() + TIME_TO_PRESS_BUTTON * 1e9
-            self.__question_timeout_manage_lights(
-                self.reading_until, TIME_TO_PRESS_BUTTON
-            )
+            self.reading_since = self.__time()
+            self.reading_until = self.reading_since + ANSWER_WINDOW
         self.actions.play_start_accepting = True
         self.__set_reading(True)
+        if self.state == States.ANSWERING_QUESTION:
+            self.answer_deadline = self.reading_until
+            self.controllers.turn_light_off(list(self.lockouts))
+            self.controllers.animate("chase", self.__get_teams_ready())
 
     def answer_question(self, correct: bool):
         """action for team answering question
@@ -287,7 +393,9 @@ class GameState:
         logging.debug("Question answered %s", correct)
         self.reset_sound()
 
-        self.questions_controller.answer(self.get_current_team(), correct)
+        team = self.get_current_team()
+        points = self.questions_controller.answer(correct)
+        self.teams_controller.add_points(team.id, points)
 
         if correct:
             self.actions.play_correct_sound = True
@@ -295,9 +403,9 @@ class GameState:
         else:
             self.actions.play_wrong_sound = True
 
-            if (
-                len(self.controllers_used_in_current_question) == 4
-            ):  # if all teams answered incorrectly
+            if len(self.controllers_used_in_current_question) == len(
+                self.teams_controller.playing
+            ):  # if all teams playing answered incorrectly
                 self.teams_controller.next_selecting()
 
         if not correct and len(self.controllers_used_in_current_question) != len(
@@ -333,19 +441,21 @@ class GameState:
         current_team = self.teams_controller.get_current_team()
 
         return {
-            "teams": [p.to_dict() for p in self.list_teams()],
-            "questions": [q.to_dict() for q in self.list_questions()],
+            "teams": self.teams_controller.list_dicts(),
+            "questions": self.questions_controller.list_dicts(),
             "state": self.state.value,
             "currentQuestion": self.questions_controller.get_current_question().to_dict(),
             "currentTeam": current_team.id if current_team is not None else None,
             "selectingTeam": (
                 selecting_team.id if selecting_team is not None else None
             ),
-            "alreadyAnswered": self.controllers_used_in_current_question,
+            "alreadyAnswered": list(self.controllers_used_in_current_question),
             "SOSAnswers": (
                 self.__get_sos_values() if self.__return_sos_answers() else []
             ),
             "actions": self.actions.to_dict(),
+            "deadlines": self.published_deadlines(),
+            "manifest": self.questions_controller.manifest_hash,
         }
 
     def add_points(self, team_id: int, points: int):
@@ -371,6 +481,14 @@ class GameState:
             and team_id in self.__get_allowed_controllers()
         )
 
+    def __get_teams_ready(self) -> List[int]:
+        """list teams allowed to play that are not locked out by a penalty
+
+        Returns:
+            List[int]: teams ready to buzz
+        """
+        return [t for t in self.__get_teams_allowed_to_play() if t not in self.lockouts]
+
     def __get_teams_allowed_to_play(self) -> List[int]:
         """list teams allowed to play
 
@@ -409,10 +527,26 @@ class GameState:
         """
         return self.teams_controller.list_teams()
 
+    def list_leaderboard(self) -> List[Team]:
+        """return the teams by standing, most points first
+
+        Returns:
+            List[Team]: the teams in the game
+        """
+        return self.teams_controller.list_leaderboard()
+
     def list_questions(self) -> List[Question]:
         """return the list of questions"""
         return self.questions_controller.list_questions()
 
+    def list_categories(self) -> Dict[str, List[Question]]:
+        """return the questions of each category
+
+        Returns:
+            Dict[str, List[Question]]: the questions of each category, by category
+        """
+        return self.questions_controller.list_categories()
+
     def reset_sound(self):
         """
         Set sounds playing to false
@@ -422,6 +556,7 @@ class GameState:
     def stop_countdown_timer(self):
         """stop the countdown timer"""
         self.actions.stop_countdown = True
+        self.countdown_deadline = None
 
     def get_question(self, idx: int) -> Question:
         """set a question by idstop_countdown
@@ -2,10 +2,55 @@
 # pylint: disable=too-many-instance-attributes
 # pylint: disable=too-many-positional-arguments
 """Module of classes used in gamestate"""
+
+from functools import wraps
 from typing import List
 
+# attribute keeping the dictionary of a memoized model
+CACHED_DICT = "_cached_dict"
+MISSING = object()
+
+
+class Memoized:
+    """Base class of the models that keep the dictionary built by to_dict
+    until one of their attributes is set to a different value
+
+    The dictionary is shared by every state published until then, so it must
+    not be changed by whoever receives it.
+    """
+
+    def __setattr__(self, name: str, value):
+        if self.__dict__.get(name, MISSING) != value:
+            self.__dict__.pop(CACHED_DICT, None)
+        super().__setattr__(name, value)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop(CACHED_DICT, None)
+        return state
+
 
-class Team:
+def memoized(to_dict):
+    """keep the result of the to_dict method of a Memoized model
+
+    Args:
+        to_dict (Callable[[Memoized], dict]): builds the dictionary
+
+    Returns:
+        Callable[[Memoized], dict]: the memoized method
+    """
+
+    @wraps(to_dict)
+    def wrapper(self: Memoized) -> dict:
+        cached = self.__dict__.get(CACHED_DICT)
+        if cached is None:
+            cached = self.__dict__[CACHED_DICT] = to_dict(self)
+        return cached
+
+    return wrapper
+
+
+class Team(Memoized):
     """
     Team class
     """
@@ -24,6 +69,7 @@ class Team:
         """
         self.balance += points
 
+    @memoized
     def to_dict(self) -> dict:
         """represent the team as a dictionary
 
@@ -41,7 +87,7 @@ class Team:
         return f"{self.id}"
 
 
-class Question:
+class Question(Memoized):
     """
     Question class
     """
@@ -67,28 +113,30 @@ class Question:
         self.time_to_answer: int = time_to_answer
         self.tie_breaker: bool = tie_breaker
 
-    def answer_incorreclty(self, team: Team):
+    def answer_incorreclty(self) -> int:
         """action for playing answering incorrectly
 
-        Args:
-            team (Team): the team that answered
+        Returns:
+            int: the points the team that answered wins
         """
-        if not self.tie_breaker:
-            team.add_points(-self.value)
+        if self.tie_breaker:
+            return 0
+        return -self.value
 
-    def answer_correctly(self, team: Team):
+    def answer_correctly(self) -> int:
         """action for playing answering correctly
 
-        Args:
-            team (Team): the team that answered
+        Returns:
+            int: the points the team that answered wins
         """
-        team.add_points(self.value)
         self.answered = True
+        return self.value
 
     def skip(self):
         """action for skipping the question"""
         self.answered = True
 
+    @memoized
     def to_dict(self) -> dict:
         """represent the question as a dictionary
 
@@ -105,3 +153,19 @@ class Question:
             "answered": self.answered,
             "tta": self.time_to_answer,
         }
+
+    def to_manifest(self) -> dict:
+        """represent the content of the question that never changes
+
+        Returns:
+            dict: the representation of the question content
+        """
+        return {
+            "id": self.id,
+            "statement": self.statement,
+            "answer": self.answer,
+            "image": self.image,
+            "value": self.value,
+            "category": self.category,
+            "tta": self.time_to_answer,
+        }
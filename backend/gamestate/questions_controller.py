@@ -1,9 +1,11 @@
-""" Module for controlling questions in the game """
+# pylint: disable=too-many-instance-attributes
+"""Module for controlling questions in the game"""
 
-from typing import List, Tuple
+from typing import Any, Callable, Dict, List, Tuple
+import hashlib
 import json
 import os
-from .models import Question, Team
+from .models import Question
 
 MIN_TIME = int(os.getenv("TIME_TO_ANSWER_MIN_TIME", "10"))
 MAX_TIME = int(os.getenv("TIME_TO_ANSWER_MAX_TIME", "30"))
@@ -90,6 +92,58 @@ class QuestionsController:
         self.tiebreak_questions: List[Question] = []
         self.in_tiebreak = False
         self.__init_questions()
+        self.__index()
+        self.__describe()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        for cached in ("dicts", "manifest", "manifest_hash"):
+            state.pop(cached, None)
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if "categories" not in state:
+            self.__index()
+        self.__describe()
+
+    def __describe(self):
+        """build the manifest with the content of the questions, which never
+        changes, and the hash clients can cache it by
+        """
+        self.dicts: List[dict] | None = None
+        self.manifest: List[dict] = [
+            q.to_manifest() for q in self.questions + self.tiebreak_questions
+        ]
+        encoded = json.dumps(self.manifest, separators=(",", ":"), ensure_ascii=False)
+        self.manifest_hash: str = hashlib.blake2b(
+            encoded.encode(), digest_size=12
+        ).hexdigest()
+
+    def __index(self):
+        """build the indexes of the questions, kept up to date as they are answered"""
+        # questions of each category, in the order they are in questions.json
+        self.categories: Dict[str, List[Question]] = {}
+        for question in self.questions:
+            self.categories.setdefault(question.category, []).append(question)
+        self.unanswered: int = sum(1 for q in self.questions if not q.answered)
+
+    def __close(self, action: Callable[[Question], Any]) -> Any:
+        """apply an action to the current question, counting it if it gets answered
+
+        Args:
+            action (Callable[[Question], Any]): the action
+
+        Returns:
+            Any: the result of the action
+        """
+        question = self.get_current_question()
+        answered = question.answered
+        result = action(question)
+        if question.answered and not answered and not self.in_tiebreak:
+            self.unanswered -= 1
+            self.dicts = None
+        return result
 
     def get_current_question(self) -> Question:
         """
@@ -126,13 +180,13 @@ class QuestionsController:
         Returns:
             bool: are all questions answered
         """
-        return all(map(lambda q: q.answered, self.questions))
+        return self.unanswered == 0
 
     def skip(self):
         """
         Skips the current question
         """
-        self.get_current_question().skip()
+        self.__close(lambda q: q.skip())
 
     def tiebreak(self):
         """
@@ -145,33 +199,35 @@ class QuestionsController:
         else:
             self.current_question_idx += 1
 
-    def __answer_correctly(self, team: Team):
+    def __answer_correctly(self) -> int:
         """action for a team answering a question correctly
 
-        Args:
-            team (Team): team that answered the question
+        Returns:
+            int: the points the team wins
         """
-        self.get_current_question().answer_correctly(team)
+        return self.__close(lambda q: q.answer_correctly())
 
-    def __answer_incorreclty(self, team: Team):
+    def __answer_incorreclty(self) -> int:
         """action for a team answering a question incorrectly
 
-        Args:
-            team (Team): team that answered the question
+        Returns:
+            int: the points the team wins
         """
-        self.get_current_question().answer_incorreclty(team)
+        return self.get_current_question().answer_incorreclty()
 
-    def answer(self, team: Team, correct: bool):
-        """action for answering a question
+    def answer(self, correct: bool) -> int:
+        """action for answering a question, the points are given to the team
+        by the teams controller
 
         Args:
-            team (Team): team that answered
             correct (bool): the answer is correct
+
+        Returns:
+            int: the points the team that answered wins
         """
         if correct:
-            self.__answer_correctly(team)
-        else:
-            self.__answer_incorreclty(team)
+            return self.__answer_correctly()
+        return self.__answer_incorreclty()
 
     def list_questions(self) -> List[Question]:
         """lists all question in the game
@@ -181,6 +237,25 @@ class QuestionsController:
         """
         return self.questions.copy()
 
+    def list_dicts(self) -> List[dict]:
+        """lists all question in the game as dictionaries, kept until one of
+        them is answered, so it must not be changed
+
+        Returns:
+            List[dict]: the representation of every question
+        """
+        if self.dicts is None:
+            self.dicts = [q.to_dict() for q in self.questions]
+        return self.dicts
+
+    def list_categories(self) -> Dict[str, List[Question]]:
+        """lists the questions of each category, in a stable order
+
+        Returns:
+            Dict[str, List[Question]]: the questions of each category, by category
+        """
+        return {c: questions.copy() for c, questions in self.categories.items()}
+
     def get_question(self, idx: int) -> Question:
         """gets a question by id
 
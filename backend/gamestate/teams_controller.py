@@ -1,9 +1,25 @@
-""" Module for controlling the teams in the game """
+"""Module for controlling the teams in the game"""
 
+from bisect import insort
 from typing import List
 import logging
+import os
 from .models import Team
 
+MAX_TEAMS = int(os.getenv("MAX_TEAMS", "16"))
+
+
+def standing(team: Team) -> tuple:
+    """the position of a team in the leaderboard, most points first
+
+    Args:
+        team (Team): the team
+
+    Returns:
+        tuple: key to sort the teams by
+    """
+    return (-team.balance, team.id)
+
 
 class TeamsController:
     """Class for controling teams atributes withtin the game"""
@@ -13,6 +29,35 @@ class TeamsController:
         self.current_playing_id: int = 0
         self.selecting_id: int = 0
         self.playing: List[int] = []
+        # teams by standing, kept up to date as their balance changes
+        self.leaderboard: List[Team] = []
+        self.dicts: List[dict] | None = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop("dicts", None)
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.dicts = None
+        if "leaderboard" not in state:
+            self.__rank_all()
+
+    def __rank_all(self):
+        """sort every team in the leaderboard"""
+        self.leaderboard = sorted(self.teams, key=standing)
+        self.dicts = None
+
+    def __rank(self, team: Team):
+        """move a team in the leaderboard after its balance changed
+
+        Args:
+            team (Team): the team
+        """
+        self.leaderboard.remove(team)
+        insort(self.leaderboard, team, key=standing)
+        self.dicts = None
 
     def get_current_team(self) -> Team:
         """get the team playing
@@ -53,11 +98,11 @@ class TeamsController:
         Args:
             teams_names (List[str]): list of names
         Raises:
-            ValueError: Too many teams (max 4)
+            ValueError: Too many teams (max MAX_TEAMS)
             ValueError: Too many players in a team (max 4)
         """
-        if len(player_teams_names) > 4:
-            raise ValueError("Too many teams (max 4)")
+        if len(player_teams_names) > MAX_TEAMS:
+            raise ValueError(f"Too many teams (max {MAX_TEAMS})")
         for t in player_teams_names:
             if len(t) > 4:
                 raise ValueError("Too many players in a team (max 4)")
@@ -65,6 +110,7 @@ class TeamsController:
         self.current_playing_id = 0
         self.selecting_id = 0
         self.playing = list(range(len(player_teams_names)))
+        self.__rank_all()
 
     def split_or_steal(self, votes: List[int]):
         """split or steal the balance of the team
@@ -82,7 +128,9 @@ class TeamsController:
             self.teams.append(Team(new_id, [team.names[stealer]]))
             self.teams[new_id].balance = team.balance
             team.balance = 0
-            del team.names[stealer]
+            # replaced instead of changed in place so the team sees the change
+            team.names = team.names[:stealer] + team.names[stealer + 1 :]
+        self.__rank_all()
 
     def set_selecting(self, idx: int):
         """set team with given id as selecting
@@ -106,8 +154,12 @@ class TeamsController:
         Returns:
             bool: the teams are in a tie
         """
-        max_tokens = max(p.balance for p in self.teams)
-        teams_with_max_tokens = [p.id for p in self.teams if p.balance == max_tokens]
+        max_tokens = self.leaderboard[0].balance
+        teams_with_max_tokens = []
+        for team in self.leaderboard:
+            if team.balance != max_tokens:
+                break
+            teams_with_max_tokens.append(team.id)
         if len(teams_with_max_tokens) > 1:
             self.playing = teams_with_max_tokens
             return True
@@ -121,15 +173,13 @@ class TeamsController:
         """
         if self.teams == []:
             return None
-        c = self.teams[0]
-        for t in self.teams[1:]:
-            if t.balance > c.balance:
-                c = t
-        return c
+        return self.leaderboard[0]
 
     def next_selecting(self):
         """make the next team in line be the selecting one"""
-        self.selecting_id = (self.selecting_id + 1) % 4
+        if self.teams == []:
+            return
+        self.selecting_id = (self.selecting_id + 1) % len(self.teams)
 
     def set_selecting_as_current(self):
         """make the team playing as the selecting"""
@@ -143,6 +193,25 @@ class TeamsController:
         """
         return self.teams.copy()
 
+    def list_dicts(self) -> List[dict]:
+        """return the teams in the game as dictionaries, kept until one of
+        them changes, so it must not be changed
+
+        Returns:
+            List[dict]: the representation of every team
+        """
+        if self.dicts is None:
+            self.dicts = [t.to_dict() for t in self.teams]
+        return self.dicts
+
+    def list_leaderboard(self) -> List[Team]:
+        """return the teams by standing, most points first
+
+        Returns:
+            List[Team]: list of teams by standing
+        """
+        return self.leaderboard.copy()
+
     def add_points(self, team_id: int, points: int):
         """add points to a team
 
@@ -150,4 +219,6 @@ class TeamsController:
             team_id (int): id of the team
             points (int): points to add
         """
-        self.get_team(team_id).balance += points
+        team = self.get_team(team_id)
+        team.add_points(points)
+        self.__rank(team)
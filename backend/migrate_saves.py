@@ -0,0 +1,25 @@
+"""Module for importing the pickled saves of older versions into the saves database"""
+
+import os
+import argparse
+from dotenv import load_dotenv
+from saves import SAVES_DIR, EventLog, import_pickles
+from gamestate.gamestate import GameState
+
+parser = argparse.ArgumentParser(description="Jeopardy Saves Migration")
+parser.add_argument(
+    "--dir", default=SAVES_DIR, help="Directory with the .pkl save files."
+)
+
+
+if __name__ == "__main__":
+    load_dotenv("backend/.env", override=True)
+    CONTROLLERS_PORT = int(os.getenv("CONTROLLERS_PORT", "8001"))
+
+    args = parser.parse_args()
+    log = EventLog()
+    log.open(lambda: GameState("localhost", CONTROLLERS_PORT))
+    try:
+        print(f"Imported {import_pickles(log, args.dir)} saves")
+    finally:
+        log.close()
@@ -0,0 +1,154 @@
+"""Module responsable for receiving the buzz presses of the buzz controllers process"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Awaitable, Callable
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from arbiter import BuzzArbiter
+from shm import SHM_POLL_INTERVAL, PressRing
+from tasks import spawn
+
+router = APIRouter()
+
+
+class PressReceiver:
+    """Class to take the presses of the buzz controllers processes, over the
+    websocket or the shared memory ring, and submit them to the arbiter
+    """
+
+    def __init__(self, arbiter: BuzzArbiter):
+        """Initialize the receiver
+
+        Args:
+            arbiter (BuzzArbiter): the arbiter applying the presses
+        """
+        self.arbiter = arbiter
+        # last sequence number and clock offset of each process
+        self.sessions: dict[str | None, int] = {}
+        self.clocks: dict[str | None, int] = {}
+        # acknowledgements waiting for their presses
+        self.acks: set[asyncio.Task] = set()
+
+    def ingest(self, session: str | None, presses: list) -> tuple[list, int]:
+        """take the presses received from the buzz controllers that were not
+        received before, with the time they were pressed on the server clock
+
+        Args:
+            session (str | None): id of the buzz controllers process
+            presses (list): the presses, in order, each with its sequence number
+
+        Returns:
+            tuple[list, int]: the new presses and the sequence number of the last one
+        """
+        last = self.sessions.get(session, 0)
+        new = [p for p in presses if p["seq"] > last]
+        if new and new[0]["seq"] != last + 1:
+            logging.warning(
+                "Missing buzz presses %d to %d", last + 1, new[0]["seq"] - 1
+            )
+        offset = self.clocks.get(session)
+        received_at = time.monotonic_ns()
+        for press in new:
+            if offset is not None and "at" in press:
+                press["at"] += offset
+            else:
+                press["at"] = received_at
+            last = press["seq"]
+        self.sessions[session] = last
+        return new, last
+
+    async def serve(self, ws: WebSocket):
+        """receive the messages of a buzz controllers process until it disconnects
+
+        The hello message carries the monotonic clock of the process, the offset
+        to the server clock is used to convert the time stamped on each press.
+        The delay of the hello shifts every press of the process by the same
+        amount, so it does not change which of them was pressed first.
+
+        Args:
+            ws (WebSocket): websocket connection
+        """
+        session = None
+        try:
+            while True:
+                message = json.loads(await ws.receive_text())
+                if message.get("type") == "hello":
+                    session = message.get("session")
+                    if "clock" in message:
+                        self.clocks[session] = time.monotonic_ns() - message["clock"]
+                elif message.get("type") == "presses":
+                    presses, ack = self.ingest(session, message["presses"])
+                    applied = self.arbiter.submit(presses) if presses else None
+                    spawn(self.acks, acknowledge_presses(ws, applied, ack))
+        except WebSocketDisconnect:
+            pass
+
+    async def drain(self, ring: PressRing):
+        """apply the presses the buzz controllers process puts in shared memory,
+        it runs on the same machine so their monotonic clocks are the same
+
+        Args:
+            ring (PressRing): the shared memory ring
+        """
+        while True:
+            presses = ring.drain()
+            if presses:
+                self.arbiter.submit(
+                    [
+                        {"controller": controller, "color": color, "at": at}
+                        for controller, color, at in presses
+                    ]
+                )
+            await asyncio.sleep(SHM_POLL_INTERVAL)
+
+
+async def apply_presses(
+    run_command: Callable[[str, dict], Awaitable[None]], presses: list
+):
+    """apply the presses of an arbitration window, in the command actor
+
+    Args:
+        run_command (Callable[[str, dict], Awaitable[None]]): applies a command
+        presses (list): the presses, sorted by the time they were pressed
+    """
+    for press in presses:
+        try:
+            await run_command(
+                "buzz",
+                {
+                    "controller": press["controller"],
+                    "color": press["color"],
+                    "at": press["at"],
+                },
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logging.error("Failed to apply buzz press: %s", e)
+
+
+async def acknowledge_presses(ws: WebSocket, applied: asyncio.Future | None, seq: int):
+    """acknowledge the presses received once they were applied
+
+    Args:
+        ws (WebSocket): websocket connection of the buzz controllers process
+        applied (asyncio.Future | None): done when the presses were applied
+        seq (int): the sequence number of the last press received
+    """
+    try:
+        if applied is not None:
+            await applied
+        await ws.send_json({"type": "ack", "seq": seq})
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logging.info("Failed to acknowledge buzz presses: %s", e)
+
+
+@router.websocket("/ws/buzz")
+async def buzz_endpoint(ws: WebSocket):
+    """Handle the connection of the buzz controllers process
+
+    Args:
+        ws (WebSocket): websocket connection
+    """
+    await ws.accept()
+    await ws.app.my_presses.serve(ws)
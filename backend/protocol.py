@@ -0,0 +1,183 @@
+"""Module responsable for the versioned state protocol used over the websocket
+
+Clients choose a protocol when connecting to /ws:
+
+- ``full`` (default): every update is the whole state, as sent to old frontends
+- ``patch``: a ``snapshot`` message on connect, followed by ``patch`` messages
+  with the JSON Patch (RFC 6902) operations between consecutive versions,
+  including the versions that clear the one-shot actions once broadcast
+
+A ``patch`` client that reconnects may pass the ``epoch`` of its snapshot and
+the last ``seq`` it applied, it then receives a single ``batch`` message with
+the patches it missed, or a new snapshot if they are no longer kept.
+"""
+
+from collections import deque
+import os
+import secrets
+from broadcast import encode
+
+STATE_HISTORY_SIZE = int(os.getenv("STATE_HISTORY_SIZE", "64"))
+
+FULL = "full"
+PATCH = "patch"
+PROTOCOLS = (FULL, PATCH)
+
+
+def escape(key: str) -> str:
+    """escape a key to be used as a JSON Pointer token
+
+    Args:
+        key (str): the key to escape
+
+    Returns:
+        str: the escaped key
+    """
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def diff(old, new, path: str = "") -> list:
+    """compute the JSON Patch operations that turn one document into another
+
+    Lists with the same length are compared item by item, otherwise they are
+    replaced as a whole.
+
+    Args:
+        old: the previous document
+        new: the new document
+        path (str, optional): JSON Pointer of the documents. Defaults to "".
+
+    Returns:
+        list: the JSON Patch operations
+    """
+    if old is new:
+        return []
+    if type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
+
+    ops = []
+    if isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{escape(key)}"})
+        for key, value in new.items():
+            key_path = f"{path}/{escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": key_path, "value": value})
+            else:
+                ops.extend(diff(old[key], value, key_path))
+    elif isinstance(new, list) and len(old) == len(new):
+        for i, (a, b) in enumerate(zip(old, new)):
+            ops.extend(diff(a, b, f"{path}/{i}"))
+    elif old != new:
+        ops.append({"op": "replace", "path": path, "value": new})
+    return ops
+
+
+class StateStream:
+    """Class to keep the published state and its version"""
+
+    def __init__(self):
+        self.epoch: str = secrets.token_hex(4)
+        self.seq: int = 0
+        self.state: dict | None = None
+        self.snapshots: dict[str, str] = {}
+        self.history: deque[tuple[int, str]] = deque(maxlen=STATE_HISTORY_SIZE)
+
+    def publish(self, state: dict) -> dict[str, str]:
+        """publish a new version of the state
+
+        Args:
+            state (dict): the new state
+
+        Returns:
+            dict[str, str]: the encoded update for each protocol
+        """
+        ops = diff(self.state, state) if self.state is not None else None
+        if ops is None:
+            self.__version(state)
+            self.history.clear()
+            patch = self.snapshot(PATCH)
+        else:
+            patch = self.__patch(state, ops)
+        return {FULL: encode(state), PATCH: patch}
+
+    def settle(self, changes: dict) -> dict[str, str]:
+        """publish a new version of the state that clears one-shot fields after
+        they were broadcast, only patch clients are sent it, full clients get
+        the fields cleared with the next update
+
+        Args:
+            changes (dict): the top level fields that changed
+
+        Returns:
+            dict[str, str]: the encoded patch, empty if nothing changed
+        """
+        state = {**self.state, **changes}
+        ops = diff(self.state, state)
+        if not ops:
+            return {}
+        return {PATCH: self.__patch(state, ops)}
+
+    def __version(self, state: dict):
+        """make a state the current version"""
+        self.seq += 1
+        self.state = state
+        self.snapshots = {}
+
+    def __patch(self, state: dict, ops: list) -> str:
+        """make a state the current version and keep the patch to it
+
+        Args:
+            state (dict): the new state
+            ops (list): the JSON Patch operations from the previous version
+
+        Returns:
+            str: the encoded patch
+        """
+        self.__version(state)
+        patch = encode({"type": "patch", "seq": self.seq, "ops": ops})
+        self.history.append((self.seq, patch))
+        return patch
+
+    def snapshot(self, protocol: str) -> str:
+        """get the encoded snapshot of the current version
+
+        Args:
+            protocol (str): the protocol of the client
+
+        Returns:
+            str: the encoded snapshot
+        """
+        if protocol not in self.snapshots:
+            if protocol == PATCH:
+                self.snapshots[protocol] = encode(
+                    {
+                        "type": "snapshot",
+                        "epoch": self.epoch,
+                        "seq": self.seq,
+                        "state": self.state,
+                    }
+                )
+            else:
+                self.snapshots[protocol] = encode(self.state)
+        return self.snapshots[protocol]
+
+    def resume(self, epoch: str, since: int) -> str | None:
+        """get the updates a client missed since the last version it applied
+
+        Args:
+            epoch (str): the epoch of the snapshot the client started from
+            since (int): the last version the client applied
+
+        Returns:
+            str | None: a batch with the missed patches, None if they are no longer kept
+        """
+        if epoch != self.epoch or since > self.seq:
+            return None
+        if since == self.seq:
+            return encode({"type": "batch", "seq": self.seq, "messages": []})
+        if not self.history or self.history[0][0] > since + 1:
+            return None
+        frames = [frame for seq, frame in self.history if seq > since]
+        return f'{{"type":"batch","seq":{self.seq},"messages":[{",".join(frames)}]}}'
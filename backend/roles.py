@@ -0,0 +1,74 @@
+# pylint: disable=too-few-public-methods
+"""Module responsable for the views of the state sent to each kind of screen
+
+Clients choose a role when connecting to /ws:
+
+- ``audience``: the screens the players see, without the answers, nor the
+  hash of the question manifest that has them, and with only what the board
+  shows of each question
+- ``host``: the host and staff screens, with the answer of the current question
+  and the board of the audience
+- ``fix`` (default): the whole state, as sent to old frontends
+"""
+
+AUDIENCE = "audience"
+HOST = "host"
+FIX = "fix"
+ROLES = (AUDIENCE, HOST, FIX)
+
+# fields of each question the board needs
+BOARD_FIELDS = ("id", "value", "category", "answered")
+
+
+class Projector:
+    """Class to project the state for each role
+
+    The questions only change when one is answered, so the board projected
+    from a question is kept while its dictionary is the same, and the whole
+    board while the list is, which lets the patch diff skip it.
+    """
+
+    def __init__(self):
+        self.questions: list | None = None
+        self.board: list = []
+
+    def __board(self, questions: list) -> list:
+        """project the questions to what the board shows of them
+
+        Args:
+            questions (list): the dictionaries of the questions
+
+        Returns:
+            list: the projected questions
+        """
+        if questions is self.questions:
+            return self.board
+        previous = self.questions or []
+        self.board = [
+            (
+                self.board[i]
+                if i < len(previous) and previous[i] is question
+                else {field: question[field] for field in BOARD_FIELDS}
+            )
+            for i, question in enumerate(questions)
+        ]
+        self.questions = questions
+        return self.board
+
+    def project(self, state: dict) -> dict[str, dict]:
+        """project the state for every role
+
+        Args:
+            state (dict): the state, as given by GameState.to_dict
+
+        Returns:
+            dict[str, dict]: the state for each role
+        """
+        board = self.__board(state["questions"])
+        host = {**state, "questions": board}
+        current = state["currentQuestion"]
+        audience = {k: v for k, v in host.items() if k != "manifest"}
+        audience["currentQuestion"] = {
+            k: v for k, v in current.items() if k != "answer"
+        }
+        return {AUDIENCE: audience, HOST: host, FIX: state}
@@ -1,84 +1,540 @@
-""" Module for saving and loading game states"""
+# pylint: disable=too-many-instance-attributes
+"""Module for saving and loading game states
 
+Every command applied to the game state is recorded as an event in a SQLite
+database, and a checkpoint of the whole state is stored every
+CHECKPOINT_INTERVAL events. A state is restored by loading the closest
+checkpoint and replaying the events that came after it.
+
+Checkpoints are compressed, and only every FULL_CHECKPOINT_INTERVAL-th one is
+a full image: the others are compressed using the previous full image as the
+compression dictionary, so they only take the bytes that changed.
+"""
+
+from threading import Condition, Lock, Thread
+from time import monotonic, monotonic_ns, time
+from typing import Callable, List, Tuple
+import json
+import logging
 import os
 import pickle
-from time import time
-from typing import List, Tuple
+import sqlite3
+import zlib
 from gamestate.gamestate import GameState
+from gamestate.commands import apply_command
+
+SAVES_DIR = "backend/saves"
+SAVES_DB = f"{SAVES_DIR}/saves.db"
+CHECKPOINT_INTERVAL = int(os.getenv("CHECKPOINT_INTERVAL", "50"))
+SAVES_RETENTION = int(os.getenv("SAVES_RETENTION", "0"))
+FULL_CHECKPOINT_INTERVAL = int(os.getenv("FULL_CHECKPOINT_INTERVAL", "10"))
+SAVE_COALESCE_WINDOW = float(os.getenv("SAVE_COALESCE_WINDOW", "0.25"))
+SAVE_MAX_AGE = float(os.getenv("SAVE_MAX_AGE", "1"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    seq INTEGER NOT NULL,
+    time INTEGER NOT NULL,
+    at INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    payload TEXT,
+    scores TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    event_id INTEGER PRIMARY KEY,
+    state BLOB NOT NULL,
+    encoding TEXT NOT NULL DEFAULT 'pickle',
+    base INTEGER
+);
+"""
+# zlib only looks back this many bytes, so a longer dictionary is useless
+ZDICT_SIZE = 32768
 
 
-def get_file_timestamp(name: str) -> int:
-    """get the timestamp of a save file
+def connect(path: str = SAVES_DB) -> sqlite3.Connection:
+    """open the saves database, creating it if needed
 
     Args:
-        name (str): the name of the save file
+        path (str, optional): the path of the database. Defaults to SAVES_DB.
 
     Returns:
-        int: the timestamp of the save file
+        sqlite3.Connection: the connection to the database
     """
-    return int(name.split(".")[0])
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    columns = {row[1] for row in db.execute("PRAGMA table_info(checkpoints)")}
+    if "encoding" not in columns:
+        db.execute(
+            "ALTER TABLE checkpoints ADD COLUMN encoding TEXT NOT NULL DEFAULT 'pickle'"
+        )
+        db.execute("ALTER TABLE checkpoints ADD COLUMN base INTEGER")
+    return db
 
 
-def delete_future_saves(name: str):
-    """delete any save files with a timestamp greater than the given name
+def store_checkpoint(
+    db: sqlite3.Connection,
+    event_id: int,
+    data: bytes,
+    base: Tuple[int, bytes] | None = None,
+):
+    """store a pickled game state, as a full image or as a delta against a base
+
     Args:
-        name: filename of the save file
+        db (sqlite3.Connection): the connection to the database
+        event_id (int): the id of the event the checkpoint was taken after
+        data (bytes): the pickled game state
+        base (Tuple[int, bytes] | None, optional): the id and pickled state of
+            the full checkpoint to compress against. Defaults to None.
     """
-    timestamp = get_file_timestamp(name)
-    saves = get_saves_names()
-    for save_timestamp, save_name in saves:
-        if save_timestamp > timestamp:
-            os.remove(f"backend/saves/{save_name}")
+    if base is None:
+        row = (event_id, zlib.compress(data), "zlib", None)
+    else:
+        compressor = zlib.compressobj(zdict=base[1][-ZDICT_SIZE:])
+        delta = compressor.compress(data) + compressor.flush()
+        row = (event_id, delta, "zlib-delta", base[0])
+    db.execute(
+        "INSERT OR REPLACE INTO checkpoints (event_id, state, encoding, base)"
+        " VALUES (?, ?, ?, ?)",
+        row,
+    )
+
 
+def load_checkpoint(db: sqlite3.Connection, event_id: int) -> bytes:
+    """load a stored game state, rebuilding it from its base if it is a delta
 
-def get_saves_names() -> List[Tuple[int, str]]:
-    """get all saved game states
+    Args:
+        db (sqlite3.Connection): the connection to the database
+        event_id (int): the id of the event the checkpoint was taken after
 
     Returns:
-        List[Tuple[int,str]]: list of saved game states with their timestamps
+        bytes: the pickled game state
     """
-    l = os.listdir("backend/saves")
-    return sorted(map(lambda x: (get_file_timestamp(x), x), l))
+    data, encoding, base = db.execute(
+        "SELECT state, encoding, base FROM checkpoints WHERE event_id = ?",
+        (event_id,),
+    ).fetchone()
+    if encoding == "zlib":
+        return zlib.decompress(data)
+    if encoding == "zlib-delta":
+        zdict = load_checkpoint(db, base)[-ZDICT_SIZE:]
+        decompressor = zlib.decompressobj(zdict=zdict)
+        return decompressor.decompress(data) + decompressor.flush()
+    return data
 
 
-def save_state(state: GameState, action: str):
-    """save the current game state
+def get_scores(state: GameState) -> str:
+    """summarize the balance of every team
 
     Args:
-        state (GameState): the current game state
-        action (str): the action that led to this state
+        state (GameState): the game state
+
+    Returns:
+        str: the balances as a JSON list
     """
-    with open(f"backend/saves/{int(time())}.{action}.pkl", "wb") as f:
-        pickle.dump(state, f)
+    return json.dumps([t.balance for t in state.list_teams()])
+
 
+def compact(db: sqlite3.Connection, retention: int):
+    """forget the oldest events, keeping at least the given number of them
 
-def load_save(name: str) -> GameState | None:
-    """load a saved game state and delete any future saves
+    Events are only dropped up to a full checkpoint, so the remaining ones can
+    still be restored.
 
     Args:
-        name (str): the name of the saved game state
+        db (sqlite3.Connection): the connection to the database
+        retention (int): the number of events to keep
+    """
+    (last,) = db.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()
+    row = db.execute(
+        "SELECT MAX(event_id) FROM checkpoints"
+        " WHERE event_id <= ? AND encoding != 'zlib-delta'",
+        (last - retention,),
+    ).fetchone()
+    if row[0] is None:
+        return
+    with db:
+        db.execute("DELETE FROM events WHERE id <= ?", row)
+        db.execute("DELETE FROM checkpoints WHERE event_id < ?", row)
 
-    Returns:
-        GameState: the loaded game state
+
+class SnapshotWriter:
+    """Class to write game states in a background thread
+
+    States are pickled when submitted, so the save matches the state at that
+    moment, and written by the thread. A burst of submissions within
+    SAVE_COALESCE_WINDOW seconds is written once, with the latest state, and no
+    submission waits more than SAVE_MAX_AGE seconds to be written.
     """
-    if os.path.exists(f"backend/saves/{name}") and os.path.isfile(
-        f"backend/saves/{name}"
-    ):
 
-        delete_future_saves(name)
-        with open(f"backend/saves/{name}", "rb") as f:
-            return pickle.load(f)
-    return None
+    def __init__(self, write: Callable[[int, bytes], None]):
+        """Initialize the writer
+
+        Args:
+            write (Callable[[int, bytes], None]): stores a pickled state with its key
+        """
+        self.write = write
+        self.condition = Condition()
+        self.pending: Tuple[int, bytes] | None = None
+        self.pending_since: float | None = None
+        self.writing = False
+        self.closed = False
+        self.written = 0
+        self.coalesced = 0
+        self.thread = Thread(target=self.__run, name="snapshot-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, key: int, state: GameState):
+        """request the game state to be saved
+
+        Args:
+            key (int): the key to save the state with
+            state (GameState): the current game state
+        """
+        data = pickle.dumps(state)
+        with self.condition:
+            if self.pending is not None:
+                self.coalesced += 1
+            else:
+                self.pending_since = monotonic()
+            self.pending = (key, data)
+            self.condition.notify_all()
+
+    def lag(self) -> float:
+        """how far behind the writer is
+
+        Returns:
+            float: seconds since the oldest state not yet written was submitted
+        """
+        with self.condition:
+            if self.pending_since is None:
+                return 0.0
+            return monotonic() - self.pending_since
+
+    def status(self) -> dict:
+        """report the state of the writer
+
+        Returns:
+            dict: the lag in seconds and the number of written and coalesced saves
+        """
+        return {
+            "lag": self.lag(),
+            "written": self.written,
+            "coalesced": self.coalesced,
+        }
+
+    def flush(self):
+        """wait until every submitted state is written"""
+        with self.condition:
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: self.pending is None and not self.writing)
+
+    def close(self):
+        """write the pending state and stop the thread"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def __run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending is not None or self.closed)
+                if self.pending is None:
+                    return
+                # wait for the burst to end, but no longer than the max age
+                while not self.closed:
+                    deadline = min(
+                        self.pending_since + SAVE_MAX_AGE,
+                        monotonic() + SAVE_COALESCE_WINDOW,
+                    )
+                    pending = self.pending
+                    self.condition.wait(max(deadline - monotonic(), 0))
+                    if self.pending is pending or monotonic() >= deadline:
+                        break
+                key, data = self.pending
+                self.pending = None
+                self.pending_since = None
+                self.writing = True
+            try:
+                self.write(key, data)
+            except (OSError, sqlite3.Error) as e:
+                logging.error("Failed to save state: %s", e)
+            with self.condition:
+                self.writing = False
+                self.written += 1
+                self.condition.notify_all()
+
+
+class EventLog:
+    """Class to record the commands applied to the game state"""
+
+    def __init__(self, path: str = SAVES_DB):
+        """Initialize the event log
+
+        Args:
+            path (str, optional): the path of the database. Defaults to SAVES_DB.
+        """
+        self.path = path
+        self.lock = Lock()
+        self.db: sqlite3.Connection | None = None
+        self.seq = 0
+        # last full checkpoint and how many deltas were written against it
+        self.base: Tuple[int, bytes] | None = None
+        self.deltas = 0
+        self.writer = SnapshotWriter(self.__write_checkpoint)
+
+    def __write_checkpoint(self, event_id: int, data: bytes):
+        """store a checkpoint, called from the writer thread
+
+        Args:
+            event_id (int): the id of the event the checkpoint was taken after
+            data (bytes): the pickled game state
+        """
+        if self.base is None or self.deltas + 1 >= FULL_CHECKPOINT_INTERVAL:
+            base, self.deltas = None, 0
+        else:
+            base, self.deltas = self.base, self.deltas + 1
+        db = connect(self.path)
+        try:
+            with db:
+                store_checkpoint(db, event_id, data, base)
+            if base is None:
+                self.base = (event_id, data)
+            if SAVES_RETENTION > 0:
+                compact(db, SAVES_RETENTION)
+        finally:
+            db.close()
 
+    def __replay(self) -> GameState:
+        """rebuild a game state from the last checkpoint and the events after it
 
-def get_last_save() -> GameState | None:
-    """get the last saved game state
+        Returns:
+            GameState: the game state
+        """
+        (base,) = self.db.execute("SELECT MAX(event_id) FROM checkpoints").fetchone()
+        state = pickle.loads(load_checkpoint(self.db, base))
+        state.controllers.muted = True
+        try:
+            for action, payload, at in self.db.execute(
+                "SELECT action, payload, at FROM events WHERE id > ? ORDER BY id",
+                (base,),
+            ):
+                state.reset_sound()
+                apply_command(state, action, json.loads(payload), at)
+            state.reset_sound()
+            state.reset_deadlines()
+        finally:
+            state.controllers.muted = False
+        state.controllers.resync()
+        return state
+
+    def __last_seq(self) -> int:
+        row = self.db.execute("SELECT seq FROM events ORDER BY id DESC LIMIT 1")
+        return (row.fetchone() or (0,))[0]
+
+    def open(self, factory: Callable[[], GameState]) -> GameState:
+        """open the log and restore the last game state
+
+        Args:
+            factory (Callable[[], GameState]): creates a new game when there is no log
+
+        Returns:
+            GameState: the last game state
+        """
+        if not os.path.exists(os.path.dirname(self.path)):
+            os.mkdir(os.path.dirname(self.path))
+        self.db = connect(self.path)
+        self.seq = self.__last_seq()
+        if self.db.execute("SELECT 1 FROM checkpoints LIMIT 1").fetchone():
+            return self.__replay()
+        state = factory()
+        with self.db:
+            store_checkpoint(self.db, 0, pickle.dumps(state))
+        return state
+
+    def apply(self, state: GameState, name: str, payload: dict) -> tuple:
+        """apply a command to the game state, without recording it yet
+
+        Args:
+            state (GameState): the game state
+            name (str): the name of the command
+            payload (dict): the arguments of the command
+
+        Returns:
+            tuple: the event to record
+        """
+        at = monotonic_ns()
+        apply_command(state, name, payload, at)
+        return (
+            int(time()),
+            at,
+            name,
+            json.dumps(payload, separators=(",", ":")),
+            get_scores(state),
+        )
+
+    def record(self, state: GameState, event: tuple):
+        """record an applied command, it can be called from a worker thread
+        as long as the events are recorded in the order they were applied and
+        the state does not change until it returns
+
+        Args:
+            state (GameState): the game state, after the command
+            event (tuple): the event returned by apply
+        """
+        with self.lock:
+            with self.db:
+                event_id = self.db.execute(
+                    "INSERT INTO events (seq, time, at, action, payload, scores)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.seq + 1, *event),
+                ).lastrowid
+            self.seq += 1
+
+            if self.seq % CHECKPOINT_INTERVAL == 0:
+                self.writer.submit(event_id, state)
+
+    def execute(self, state: GameState, name: str, payload: dict):
+        """apply a command to the game state and record it
+
+        Args:
+            state (GameState): the game state
+            name (str): the name of the command
+            payload (dict): the arguments of the command
+        """
+        self.record(state, self.apply(state, name, payload))
+
+    def history(self, offset: int = 0, limit: int | None = None) -> List[dict]:
+        """list the recorded events, oldest first
+
+        Args:
+            offset (int, optional): the number of events to skip. Defaults to 0.
+            limit (int | None, optional): the maximum number of events. Defaults to None.
+
+        Returns:
+            List[dict]: the id, seq, time, action and scores of each event
+        """
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, seq, time, action, scores FROM events"
+                " ORDER BY id LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        return [
+            {
+                "id": event_id,
+                "seq": seq,
+                "time": timestamp,
+                "action": action,
+                "scores": json.loads(scores),
+            }
+            for event_id, seq, timestamp, action, scores in rows
+        ]
+
+    def list_saves(self, offset: int = 0, limit: int | None = None) -> List[str]:
+        """get the names of the points the game can be reverted to
+
+        Args:
+            offset (int, optional): the number of events to skip. Defaults to 0.
+            limit (int | None, optional): the maximum number of events. Defaults to None.
+
+        Returns:
+            List[str]: the names, oldest first
+        """
+        return [
+            f"{e['id']}.{e['time']}.{e['action'].replace('/', '')}"
+            for e in self.history(offset, limit)
+        ]
+
+    def rollback(self, name: str) -> GameState | None:
+        """revert the game to the state right after an event, forgetting
+        every event that came after it
+
+        Args:
+            name (str): the name of the point to revert to
+
+        Returns:
+            GameState | None: the game state | None if the point does not exist
+        """
+        try:
+            event_id = int(name.split(".")[0])
+        except ValueError:
+            return None
+        with self.lock:
+            self.writer.flush()
+            row = self.db.execute(
+                "SELECT seq FROM events WHERE id = ?", (event_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            with self.db:
+                self.db.execute("DELETE FROM events WHERE id > ?", (event_id,))
+                self.db.execute(
+                    "DELETE FROM checkpoints WHERE event_id > ?", (event_id,)
+                )
+            self.seq = row[0]
+            self.base = None
+            return self.__replay()
+
+    def status(self) -> dict:
+        """report the state of the log
+
+        Returns:
+            dict: the number of events and the state of the checkpoint writer
+        """
+        with self.lock:
+            (events,) = self.db.execute("SELECT COUNT(*) FROM events").fetchone()
+        return {"events": events, **self.writer.status()}
+
+    def close(self):
+        """write the pending checkpoint and close the log"""
+        self.writer.close()
+        if self.db is not None:
+            self.db.close()
+
+
+def import_pickles(log: EventLog, directory: str = SAVES_DIR) -> int:
+    """import the pickled saves written by older versions, one file per action
+
+    Each file becomes an event with its own checkpoint, so it is never replayed,
+    stored as a delta against the previous full one like any other checkpoint.
+
+    Args:
+        log (EventLog): an open event log
+        directory (str, optional): where the files are. Defaults to SAVES_DIR.
 
     Returns:
-        GameState | None: the last saved game state | None if there is no saved state
+        int: the number of imported saves
     """
-    saves = get_saves_names()
-    if saves:
-        _, last_save = saves[-1]
-        return load_save(last_save)
-    return None
+    names = sorted(
+        (int(name.split(".")[0]), name)
+        for name in os.listdir(directory)
+        if name.endswith(".pkl")
+    )
+    base = None
+    with log.lock, log.db:
+        for i, (timestamp, name) in enumerate(names):
+            with open(f"{directory}/{name}", "rb") as f:
+                data = f.read()
+            state = pickle.loads(data)
+            log.seq += 1
+            event_id = log.db.execute(
+                "INSERT INTO events (seq, time, at, action, payload, scores)"
+                " VALUES (?, ?, ?, ?, NULL, ?)",
+                (
+                    log.seq,
+                    timestamp,
+                    timestamp * 10**9,
+                    name.split(".")[1],
+                    get_scores(state),
+                ),
+            ).lastrowid
+            if i % FULL_CHECKPOINT_INTERVAL == 0:
+                store_checkpoint(log.db, event_id, data)
+                base = (event_id, data)
+            else:
+                store_checkpoint(log.db, event_id, data, base)
+    return len(names)
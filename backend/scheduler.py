@@ -0,0 +1,84 @@
+"""Module responsable for firing the deadlines of the game state"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+from tasks import spawn
+
+
+class DeadlineScheduler:
+    """Class to fire named deadlines on the monotonic clock, in nanoseconds
+
+    The game state is the source of the deadlines: after every command the
+    scheduler is given all of them and keeps a single timer for the earliest.
+    When it fires, every deadline that is due is passed to the callback at once.
+    """
+
+    def __init__(self, fire: Callable[[list[str]], Awaitable[None]]):
+        """Initialize the scheduler
+
+        Args:
+            fire (Callable[[list[str]], Awaitable[None]]): called with the names
+                of the deadlines that are due
+        """
+        self.fire = fire
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.deadlines: dict[str, int] = {}
+        self.handle: asyncio.TimerHandle | None = None
+        # callbacks running
+        self.tasks: set[asyncio.Task] = set()
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """start firing the deadlines on an event loop
+
+        Args:
+            loop (asyncio.AbstractEventLoop): the event loop of the server
+        """
+        self.loop = loop
+        loop.call_soon_threadsafe(self.__arm)
+
+    def stop(self):
+        """stop firing the deadlines"""
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        self.loop = None
+
+    def sync(self, deadlines: dict[str, int]):
+        """replace the deadlines, can be called from any thread
+
+        Args:
+            deadlines (dict[str, int]): monotonic time in nanoseconds of each deadline
+        """
+        if self.loop is None:
+            self.deadlines = dict(deadlines)
+            return
+        self.loop.call_soon_threadsafe(self.__replace, dict(deadlines))
+
+    def __replace(self, deadlines: dict[str, int]):
+        self.deadlines = deadlines
+        self.__arm()
+
+    def __arm(self):
+        """set the timer for the earliest deadline, in the event loop"""
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        if not self.deadlines or self.loop is None:
+            return
+        deadline = min(self.deadlines.values())
+        delay = max(deadline - time.monotonic_ns(), 0) / 1e9
+        self.handle = self.loop.call_later(delay, self.__expire)
+
+    def __expire(self):
+        """fire the deadlines that are due, in the event loop"""
+        self.handle = None
+        now = time.monotonic_ns()
+        due = sorted(
+            name for name, deadline in self.deadlines.items() if deadline <= now
+        )
+        for name in due:
+            del self.deadlines[name]
+        if due:
+            spawn(self.tasks, self.fire(due))
+        self.__arm()
@@ -1,45 +1,80 @@
 # pylint: disable=too-few-public-methods
 """Module responsable for hosting the api to comunicate with frontend"""
 
-from asyncio import Lock
+from contextlib import asynccontextmanager
 from typing import List
+import asyncio
+import json
 import logging
 import os
+import time
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
-from starlette.middleware.base import BaseHTTPMiddleware
 import uvicorn
-from saves import get_last_save, get_saves_names, load_save, save_state
+from actor import CommandActor
+from arbiter import BuzzArbiter
+from broadcast import Broadcaster, encode
+from buzz_interface import Buzz
+from protocol import FULL, PATCH, PROTOCOLS, StateStream
+from roles import FIX, ROLES, Projector
+from saves import EventLog
+from scheduler import DeadlineScheduler
+from presses import PressReceiver, apply_presses, router as presses_router
+from shm import PressRing
+from views import (
+    MANIFEST_CACHE_CONTROL,
+    Question,
+    State,
+    StateViews,
+    Team,
+    json_response,
+)
 from gamestate.gamestate import GameState
 
-# Initialize FastAPI app
-app = FastAPI()
-
-app.my_clients = set()
-app.my_clients_lock = Lock()
-app.my_state = None
+BUZZ_TRANSPORT = os.getenv("BUZZ_TRANSPORT", "ws")
 
 
-class StateConditionMiddleware(BaseHTTPMiddleware):
-    """Middleware for executing actions before and after each request"""
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """apply the commands, fire the deadlines of the game, and drain the
+    shared memory presses, while the server runs
+    """
+    app.my_actor.start()
+    app.my_scheduler.start(asyncio.get_running_loop())
+    task = None
+    if app.my_ring is not None:
+        task = asyncio.create_task(app.my_presses.drain(app.my_ring))
+    yield
+    if task is not None:
+        task.cancel()
+    app.my_scheduler.stop()
+    app.my_actor.stop()
 
-    async def dispatch(self, request: Request, call_next):
-        if request.method == "POST":
-            app.my_state.reset_sound()
-        response = await call_next(request)
 
-        if request.method == "POST" and response.status_code // 100 == 2:
-            logging.info("Propagating state")
-            await send_to_clients(
-                app.my_state.to_dict(), request.url.path.replace("/", "")
-            )
+# Initialize FastAPI app
+app = FastAPI(lifespan=lifespan)
 
-        return response
+app.my_broadcaster = Broadcaster()
+app.my_streams = {role: StateStream() for role in ROLES}
+app.my_projector = Projector()
+app.my_state = None
+app.my_views = None
+app.my_log = None
+app.my_ring = None
+app.my_actor = CommandActor(
+    lambda: app.my_state.reset_sound(),  # pylint: disable=unnecessary-lambda
+    lambda: publish_state(),  # pylint: disable=unnecessary-lambda
+)
+app.my_arbiter = BuzzArbiter(
+    lambda presses: app.my_actor.run(lambda: apply_presses(run_command, presses))
+)
+app.my_scheduler = DeadlineScheduler(lambda timers: expire_deadlines(timers))
+app.my_presses = PressReceiver(app.my_arbiter)
+app.include_router(presses_router)
 
 
-app.add_middleware(StateConditionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -73,33 +108,6 @@ async def catch_multiple_exceptions(_: Request, exc: Exception) -> JSONResponse:
     )
 
 
-class Team(BaseModel):
-    """JSON representation of a team"""
-
-    names: List[str]
-    balance: int
-
-
-class Question(BaseModel):
-    """JSON representation of a question"""
-
-    id: int
-    statement: str
-    answer: str
-    image: str
-    value: int
-    category: str
-    answered: bool
-
-
-class State(BaseModel):
-    """JSON representation of answering a question"""
-
-    currentTeam: Team
-    state: int
-    teams: List[Team]
-
-
 class Answer(BaseModel):
     """JSON representation of answering a question"""
 
@@ -137,76 +145,134 @@ class Buzzer(BaseModel):
     color: str
 
 
+async def run_command(name: str, payload: dict | None = None):
+    """apply a command to the game state and record it in the event log, the
+    event is written from a worker thread so the event loop is not blocked
+
+    Args:
+        name (str): the name of the command
+        payload (dict | None): the arguments of the command
+    """
+    event = app.my_log.apply(app.my_state, name, payload or {})
+    await asyncio.get_running_loop().run_in_executor(
+        None, app.my_log.record, app.my_state, event
+    )
+    app.my_scheduler.sync(app.my_state.deadlines())
+
+
+async def submit_command(name: str, payload: dict | None = None):
+    """apply a command in the command actor, after the ones already submitted,
+    and wait for the state to be propagated
+
+    Args:
+        name (str): the name of the command
+        payload (dict | None): the arguments of the command
+    """
+    await app.my_actor.run(lambda: run_command(name, payload))
+
+
+async def expire_deadlines(timers: list[str]):
+    """apply the deadlines of the game that were reached and propagate the state
+
+    Args:
+        timers (list[str]): names of the deadlines
+    """
+    try:
+        await submit_command("expire", {"timers": timers})
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logging.error("Failed to expire deadlines: %s", e)
+
+
 @app.get("/state", response_model=State)
-def get_state() -> dict:
+async def get_state(request: Request) -> Response:
     """get the state of the game
 
+    Args:
+        request (Request): the request
+
     Returns:
-        dict: JSON response
+        Response: JSON response
     """
-    return {
-        "currentTeam": app.my_state.get_current_team(),
-        "state": app.my_state.state,
-        "teams": [p.to_dict() for p in app.my_state.list_teams()],
-    }
+    return json_response(request, app.my_views.state)
 
 
 @app.get("/questions", response_model=list[list[Question]])
-def get_questions() -> list:
+async def get_questions(request: Request) -> Response:
     """list all questions
 
+    Args:
+        request (Request): the request
+
     Returns:
-        list: JSON response
+        Response: JSON response
     """
-    questions = app.my_state.list_questions()
-    categories = list({q.category for q in questions})
-    return [[q.to_dict() for q in questions if q.category == c] for c in categories]
+    return json_response(request, app.my_views.questions)
 
 
 @app.get("/winners", response_model=list[Team])
-def get_winners() -> list:
+async def get_winners(request: Request) -> Response:
     """list the game winners
 
+    Args:
+        request (Request): the request
+
     Returns:
-        list: JSON response
+        Response: JSON response
     """
-    return [
-        t.to_dict()
-        for t in sorted(
-            app.my_state.list_teams(), key=lambda p: p.balance, reverse=True
-        )
-    ]
+    return json_response(request, app.my_views.winners)
 
 
 @app.get("/teams", response_model=list[Team])
-def get_teams() -> list:
+async def get_teams(request: Request) -> Response:
     """list teams
 
+    Args:
+        request (Request): the request
+
     Returns:
-        list: JSON response
+        Response: JSON response
     """
-    return [p.to_dict() for p in app.my_state.list_teams()]
+    return json_response(request, app.my_views.teams)
 
 
 @app.get("/question/{idx}", response_model=Question)
-def get_question(idx: int) -> dict:
+async def get_question(request: Request, idx: int) -> Response:
     """_summary_
 
     Args:
+        request (Request): the request
         idx (int): _description_
 
     Returns:
-        dict: JSON response
+        Response: JSON response
     """
     print(idx)
-    q = app.my_state.get_question(idx)
-    if q is None:
+    views = app.my_views
+    if idx < 0 or idx >= len(views.question):
         raise HTTPException(status_code=404, detail="Question not found")
-    return q.to_dict()
+    return json_response(request, views.question[idx])
+
+
+@app.get("/manifest/{digest}")
+async def get_manifest(request: Request, digest: str) -> Response:
+    """get the content of every question, which never changes during a game,
+    so it is cached for good by the hash the state carries in "manifest"
+
+    Args:
+        request (Request): the request
+        digest (str): the hash of the manifest
+
+    Returns:
+        Response: JSON response
+    """
+    views = app.my_views
+    if digest != views.sources[2]:
+        raise HTTPException(status_code=404, detail="Manifest not found")
+    return json_response(request, views.manifest, MANIFEST_CACHE_CONTROL)
 
 
 @app.post("/answer", response_model=AnswerResponse)
-def post_answer(body: Answer) -> dict:
+async def post_answer(body: Answer) -> dict:
     """someone answered the question
 
     Args:
@@ -215,23 +281,27 @@ def post_answer(body: Answer) -> dict:
     Returns:
         dict: JSON response
     """
-    app.my_state.answer_question(body.correct)
-    return {"skip": (app.my_state.state != 2)}
+
+    async def answer() -> bool:
+        await run_command("answer", {"correct": body.correct})
+        return app.my_state.state != 2
+
+    return {"skip": await app.my_actor.run(answer)}
 
 
 @app.post("/skip", response_model=BasicResponse)
-def post_skip() -> dict:
+async def post_skip() -> dict:
     """skip the current question
 
     Returns:
         dict: JSON response
     """
-    app.my_state.skip_question()
+    await submit_command("skip")
     return {"status": "success"}
 
 
 @app.post("/question", response_model=BasicResponse)
-def post_set_question(body: SetQuestion) -> dict:
+async def post_set_question(body: SetQuestion) -> dict:
     """select a question
 
     Args:
@@ -240,12 +310,12 @@ def post_set_question(body: SetQuestion) -> dict:
     Returns:
         dict: JSON response
     """
-    app.my_state.select_question(body.id)
+    await submit_command("question", {"id": body.id})
     return {"status": "success"}
 
 
 @app.post("/teams", response_model=BasicResponse)
-def post_teams(body: SetTeams) -> dict:
+async def post_teams(body: SetTeams) -> dict:
     """set the name of the teams
 
     Args:
@@ -254,12 +324,12 @@ def post_teams(body: SetTeams) -> dict:
     Returns:
         dict: JSON response
     """
-    app.my_state.set_teams(body.teams)
+    await submit_command("teams", {"teams": body.teams})
     return {"status": "success"}
 
 
 @app.post("/buzz", response_model=BasicResponse)
-def post_buzz(body: Buzzer) -> dict:
+async def post_buzz(body: Buzzer) -> dict:
     """set as someone pressing the buzz button
 
     Args:
@@ -268,95 +338,95 @@ def post_buzz(body: Buzzer) -> dict:
     Returns:
         dict: JSON response
     """
-    app.my_state.buzz(body.controller, body.color)
+    await submit_command("buzz", {"controller": body.controller, "color": body.color})
     return {"status": "success"}
 
 
 @app.post("/buzz_start", response_model=BasicResponse)
-def post_buzz_start() -> dict:
+async def post_buzz_start() -> dict:
     """start accepting buzz inputs
 
     Returns:
         dict: JSON response
     """
-    app.my_state.set_answering()
+    await submit_command("buzz_start")
     return {"status": "success"}
 
 
 @app.post("/show_tiebreaker_question", response_model=BasicResponse)
-def post_show_tiebreaker_question() -> dict:
+async def post_show_tiebreaker_question() -> dict:
     """show tiebreaker
 
     Returns:
         dict: JSON response
     """
-    app.my_state.show_tiebreaker_question()
+    await submit_command("show_tiebreaker_question")
     return {"status": "success"}
 
 
 @app.post("/stop_timer", response_model=BasicResponse)
-def post_stop_timer() -> dict:
+async def post_stop_timer() -> dict:
     """stop accepting buzz inputs
 
     Returns:
         dict: JSON response
     """
-    app.my_state.stop_countdown_timer()
+    await submit_command("stop_timer")
     return {"status": "success"}
 
 
 @app.post("/show_sos", response_model=BasicResponse)
-def post_show_sos() -> dict:
+async def post_show_sos() -> dict:
     """show SOS
 
     Returns:
         dict: JSON response
     """
-    app.my_state.show_sos()
+    await submit_command("show_sos")
     return {"status": "success"}
 
 
 @app.post("/show_tiebreaker", response_model=BasicResponse)
-def post_show_tiebreaker() -> dict:
+async def post_show_tiebreaker() -> dict:
     """show tiebreaker
 
     Returns:
         dict: JSON response
     """
-    app.my_state.show_tiebreaker()
+    await submit_command("show_tiebreaker")
     return {"status": "success"}
 
 
 @app.post("/end", response_model=BasicResponse)
-def post_end() -> dict:
+async def post_end() -> dict:
     """end the game
 
     Returns:
         dict: JSON response
     """
-    app.my_state.end_game()
+    await submit_command("end")
     return {"status": "success"}
 
 
 @app.post("/play_walkin", response_model=BasicResponse)
-def post_play_walkin() -> dict:
+async def post_play_walkin() -> dict:
     """play walkin song
 
     Returns:
         dict: JSON response
     """
-    app.my_state.change_walkin(True)
+    await submit_command("play_walkin")
     return {"status": "success"}
 
 
 @app.post("/stop_walkin", response_model=BasicResponse)
-def post_stop_walkin() -> dict:
+async def post_stop_walkin() -> dict:
     """stop walkin song
 
     Returns:
         dict: JSON response
     """
-    app.my_state.change_walkin(False)
+    await submit_command("stop_walkin")
     return {"status": "success"}
 
 
@@ -368,7 +438,7 @@ class FixPoints(BaseModel):
 
 
 @app.post("/fix/points/", response_model=BasicResponse)
-def post_fix_pontos(body: FixPoints) -> dict:
+async def post_fix_pontos(body: FixPoints) -> dict:
     """add/subtract points to a team
 
     Args:
@@ -377,7 +447,7 @@ def post_fix_pontos(body: FixPoints) -> dict:
     Returns:
         dict: JSON response
     """
-    app.my_state.add_points(body.team_id, body.points)
+    await submit_command("fix/points", {"team_id": body.team_id, "points": body.points})
     return {"status": "success"}
 
 
@@ -388,7 +458,7 @@ class FixState(BaseModel):
 
 
 @app.post("/fix/state/", response_model=BasicResponse)
-def post_fix_state(body: FixState) -> dict:
+async def post_fix_state(body: FixState) -> dict:
     """change the state of the game
 
     Args:
@@ -397,7 +467,7 @@ def post_fix_state(body: FixState) -> dict:
     Returns:
         dict: JSON response
     """
-    app.my_state.set_state(body.state)
+    await submit_command("fix/state", {"state": body.state})
     return {"status": "success"}
 
 
@@ -408,7 +478,7 @@ class FixSelecting(BaseModel):
 
 
 @app.post("/fix/selecting/", response_model=BasicResponse)
-def post_fix_selecting(body: FixSelecting) -> dict:
+async def post_fix_selecting(body: FixSelecting) -> dict:
     """change the selecting team of the game
 
     Args:
@@ -417,18 +487,90 @@ def post_fix_selecting(body: FixSelecting) -> dict:
     Returns:
         dict: JSON response
     """
-    app.my_state.set_selecting(body.team_id)
+    await submit_command("fix/selecting", {"team_id": body.team_id})
     return {"status": "success"}
 
 
 @app.get("/fix/saves/", response_model=list[str])
-def get_fix_saves() -> list:
-    """list all saved game states
+def get_fix_saves(offset: int = 0, limit: int | None = None) -> list:
+    """list the saved game states
+
+    Args:
+        offset (int): the number of saves to skip
+        limit (int | None): the maximum number of saves to list
+
+    Returns:
+        list: JSON response
+    """
+    return app.my_log.list_saves(offset, limit)
+
+
+class SaveInfo(BaseModel):
+    """JSON representation of a saved game state"""
+
+    id: int
+    seq: int
+    time: int
+    action: str
+    scores: List[int]
+
+
+@app.get("/fix/saves/history/", response_model=list[SaveInfo])
+def get_fix_saves_history(offset: int = 0, limit: int | None = None) -> list:
+    """list the saved game states with their metadata
+
+    Args:
+        offset (int): the number of saves to skip
+        limit (int | None): the maximum number of saves to list
 
     Returns:
         list: JSON response
     """
-    return list(map(lambda x: x[1], get_saves_names()))
+    return app.my_log.history(offset, limit)
+
+
+class SavesStatus(BaseModel):
+    """JSON representation of the state of the event log"""
+
+    events: int
+    lag: float
+    written: int
+    coalesced: int
+
+
+@app.get("/fix/saves/status/", response_model=SavesStatus)
+def get_fix_saves_status() -> dict:
+    """report the size of the event log and how far behind the checkpoint writer is
+
+    Returns:
+        dict: JSON response
+    """
+    return app.my_log.status()
+
+
+class LightsStatus(BaseModel):
+    """JSON representation of the light commands sent to the buzz controllers"""
+
+    mask: int
+    version: int
+    synced: bool
+    breaker_open: bool
+    sent: int
+    failed: int
+    merged: int
+    last_ms: float
+    max_ms: float
+    avg_ms: float
+
+
+@app.get("/fix/lights/", response_model=LightsStatus)
+async def get_fix_lights() -> dict:
+    """report the light commands sent to the buzz controllers and their latency
+
+    Returns:
+        dict: JSON response
+    """
+    return app.my_state.controllers.stats()
 
 
 class FixSave(BaseModel):
@@ -438,7 +580,7 @@ class FixSave(BaseModel):
 
 
 @app.post("/fix/saves/", response_model=BasicResponse)
-def post_fix_saves(body: FixSave) -> dict:
+async def post_fix_saves(body: FixSave) -> dict:
     """revert to a saved game state
 
     Args:
@@ -447,48 +589,129 @@ def post_fix_saves(body: FixSave) -> dict:
     Returns:
         dict: JSON response
     """
-    state = load_save(body.name)
-    if state is None:
-        raise HTTPException(status_code=404, detail="Save not found")
-    app.my_state = state
+
+    async def rollback():
+        state = await asyncio.get_running_loop().run_in_executor(
+            None, app.my_log.rollback, body.name
+        )
+        if state is None:
+            raise HTTPException(status_code=404, detail="Save not found")
+        app.my_state.controllers.close()
+        app.my_state = state
+        app.my_scheduler.sync(state.deadlines())
+
+    await app.my_actor.run(rollback)
     return {"status": "success"}
 
 
-async def send_to_clients(message: str | dict, action: str):
-    """Broadcast a message to every websocket connected
+async def publish_state():
+    """Publish the views of the state and propagate it to the websockets"""
+    app.my_views = StateViews(app.my_state, app.my_views)
+    await send_to_clients(app.my_state.to_dict())
+
+
+def publish_roles(message: dict) -> dict[str, dict[str, str]]:
+    """Publish a new version of the state for every role
 
     Args:
-        message (str|dict): the message to broadcast
-        action (str): the action that triggered the message
-    """
-    async with app.my_clients_lock:
-        for client in list(app.my_clients):
-            if isinstance(message, str):
-                await client.send_text(message)
-            elif isinstance(message, dict):
-                await client.send_json(message)
+        message (dict): the state
+
+    Returns:
+        dict[str, dict[str, str]]: the encoded update for each protocol, by role
+    """
+    return {
+        role: app.my_streams[role].publish(state)
+        for role, state in app.my_projector.project(message).items()
+    }
+
+
+async def send_to_clients(message: dict):
+    """Publish a new version of the state to every websocket connected
+
+    Args:
+        message (dict): the state to broadcast
+    """
+    app.my_broadcaster.broadcast(publish_roles(message))
     app.my_state.reset_sound()
-    save_state(app.my_state, action)
+    actions = app.my_state.actions.to_dict()
+    app.my_broadcaster.broadcast(
+        {
+            role: stream.settle({"actions": actions})
+            for role, stream in app.my_streams.items()
+        }
+    )
+
+
+def handle_client_message(ws: WebSocket, message: str):
+    """Handle a control message sent by a websocket client
+
+    A "ping" is answered with a "pong" carrying the time it was received and
+    sent on the server clock, in milliseconds, so the client can estimate its
+    offset to the server and show the published deadlines on its own clock.
+
+    Args:
+        ws (WebSocket): websocket connection
+        message (str): the message received
+    """
+    received = time.monotonic_ns() / 1_000_000
+    try:
+        request = json.loads(message)
+    except ValueError:
+        return
+    client = app.my_broadcaster.get(ws)
+    if client is None or not isinstance(request, dict):
+        return
+    if request.get("type") == "snapshot":
+        client.push(app.my_streams[client.role].snapshot(client.protocol))
+    elif request.get("type") == "ping":
+        # stamped by the writer, after the frames queued before it
+        client.push(
+            lambda: encode(
+                {
+                    "type": "pong",
+                    "t0": request.get("t0"),
+                    "received": received,
+                    "sent": time.monotonic_ns() / 1_000_000,
+                }
+            )
+        )
 
 
 @app.websocket("/ws")
-async def websocket_endpoint(ws: WebSocket):
+async def websocket_endpoint(
+    ws: WebSocket,
+    protocol: str = FULL,
+    role: str = FIX,
+    epoch: str | None = None,
+    since: int | None = None,
+):
     """Handle websocket connections
 
     Args:
         ws (WebSocket): websocket connection
+        protocol (str): the state protocol, "full" snapshots or "patch" updates
+        role (str): the view of the state, "audience", "host" or the whole "fix"
+        epoch (str|None): epoch of the snapshot a reconnecting "patch" client has
+        since (int|None): last version a reconnecting "patch" client applied
     """
     await ws.accept()
-    async with app.my_clients_lock:
-        app.my_clients.add(ws)
-    await ws.send_json(app.my_state.to_dict())
+    if protocol not in PROTOCOLS:
+        protocol = FULL
+    if role not in ROLES:
+        role = FIX
+    stream = app.my_streams[role]
+    hello = None
+    if protocol == PATCH and since is not None:
+        hello = stream.resume(epoch, since)
+    if hello is None:
+        hello = stream.snapshot(protocol)
+    app.my_broadcaster.connect(ws, protocol, role, hello)
     try:
         while True:
             message = await ws.receive_text()
-            send_to_clients(message, "ws_message_recieved")
+            handle_client_message(ws, message)
     except WebSocketDisconnect:
-        async with app.my_clients_lock:
-            app.my_clients.remove(ws)
+        app.my_broadcaster.disconnect(ws)
 
 
 def start(host: str, port: int, controllers_port: int):
@@ -498,11 +721,21 @@ def start(host: str, port: int, controllers_port: int):
         host (str): host server will run on
         port (int): port server will run on
     """
-    if not os.path.exists("backend/saves"):
-        os.mkdir("backend/saves")
-
-    app.my_state = get_last_save()
-    if app.my_state is None:
-        app.my_state = GameState("localhost", controllers_port)
+    if BUZZ_TRANSPORT == "shm":
+        app.my_ring = PressRing(create=True)
+        Buzz.ring = app.my_ring
+    app.my_log = EventLog()
+    app.my_state = app.my_log.open(lambda: GameState("localhost", controllers_port))
+    app.my_views = StateViews(app.my_state)
+    publish_roles(app.my_state.to_dict())
+    app.my_scheduler.sync(app.my_state.deadlines())
+    if app.my_ring is not None:
+        controllers = app.my_state.controllers
+        app.my_ring.set_lights(controllers.mask, controllers.animation)
 
-    uvicorn.run(app, host=host, port=port, ws="websockets")
+    try:
+        uvicorn.run(app, host=host, port=port, ws="websockets")
+    finally:
+        app.my_log.close()
+        if app.my_ring is not None:
+            app.my_ring.close()
@@ -0,0 +1,181 @@
+"""Module responsable for the shared memory transport between the buzz
+controllers process and the server, when they run on the same machine
+
+The segment starts with a header, followed by a ring of fixed size press
+records. Only the buzz controllers process writes presses and only the server
+reads them, so the ring needs no lock: the writer fills a record before moving
+the tail, and the reader reads the records before moving the head. The light
+mask and animation go the other way in a single slot, with a version written
+before and after them so a half written slot is read again.
+
+Every field is an aligned 8 byte integer, which the processors we run on read
+and write in one go, and they keep stores in order, so this holds without
+memory barriers, which Python does not expose.
+"""
+
+import os
+import secrets
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+SHM_NAME = os.getenv("BUZZ_SHM_NAME", "jeopardy-buzz")
+SHM_CAPACITY = int(os.getenv("BUZZ_SHM_CAPACITY", "256"))
+SHM_POLL_INTERVAL = float(os.getenv("BUZZ_SHM_POLL_INTERVAL", "0.001"))
+
+COLORS = ("red", "yellow", "green", "orange", "blue")
+PATTERNS = ("blink", "chase", "flash")
+
+# capacity, epoch, head, tail, lights version, lights mask, animation and
+# lights version again, the animation packs the pattern, its period in
+# milliseconds and the mask of its controllers
+HEADER = struct.Struct("<8Q")
+(
+    CAPACITY,
+    EPOCH,
+    HEAD,
+    TAIL,
+    LIGHTS_VERSION,
+    LIGHTS_MASK,
+    LIGHTS_ANIMATION,
+    LIGHTS_CHECK,
+) = range(0, 64, 8)
+HEADER_SIZE = 64
+# monotonic time in nanoseconds, controller, color
+RECORD = struct.Struct("<qHB5x")
+WORD = struct.Struct("<Q")
+
+
+class PressRing:
+    """Ring of buzz presses and light mask in shared memory"""
+
+    def __init__(self, name: str = SHM_NAME, create: bool = False):
+        """Create or attach to the shared memory segment
+
+        Args:
+            name (str, optional): name of the segment. Defaults to SHM_NAME.
+            create (bool, optional): create the segment, replacing a stale one
+                left by a previous run. Defaults to False.
+
+        Raises:
+            FileNotFoundError: the segment was not created yet
+        """
+        if create:
+            try:
+                shared_memory.SharedMemory(name).unlink()
+            except FileNotFoundError:
+                pass
+            size = HEADER_SIZE + SHM_CAPACITY * RECORD.size
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+            epoch = secrets.randbits(63)
+            HEADER.pack_into(self.shm.buf, 0, SHM_CAPACITY, epoch, 0, 0, 0, 0, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name)
+            # attaching also registers the segment to be removed on exit
+            resource_tracker.unregister(
+                self.shm._name, "shared_memory"  # pylint: disable=protected-access
+            )
+        self.owner = create
+        self.buf = self.shm.buf
+        self.capacity = self.__get(CAPACITY)
+        self.epoch = self.__get(EPOCH)
+
+    def __get(self, offset: int) -> int:
+        return WORD.unpack_from(self.buf, offset)[0]
+
+    def __set(self, offset: int, value: int):
+        WORD.pack_into(self.buf, offset, value)
+
+    def push(self, controller: int, color: str, at: int) -> bool:
+        """add a press to the ring, only called by the buzz controllers process
+
+        Args:
+            controller (int): the id of the controller
+            color (str): color pressed
+            at (int): monotonic time in nanoseconds of the press
+
+        Returns:
+            bool: the press was added, False if the ring is full
+        """
+        tail = self.__get(TAIL)
+        if tail - self.__get(HEAD) >= self.capacity:
+            return False
+        offset = HEADER_SIZE + (tail % self.capacity) * RECORD.size
+        RECORD.pack_into(self.buf, offset, at, controller, COLORS.index(color))
+        self.__set(TAIL, tail + 1)
+        return True
+
+    def drain(self) -> list[tuple[int, str, int]]:
+        """take every press in the ring, only called by the server
+
+        Returns:
+            list[tuple[int, str, int]]: controller, color and monotonic time of each press
+        """
+        head, tail = self.__get(HEAD), self.__get(TAIL)
+        presses = []
+        for i in range(head, tail):
+            offset = HEADER_SIZE + (i % self.capacity) * RECORD.size
+            at, controller, color = RECORD.unpack_from(self.buf, offset)
+            presses.append((controller, COLORS[color], at))
+        self.__set(HEAD, tail)
+        return presses
+
+    def set_lights(self, mask: int, animation: dict | None = None):
+        """publish a new light mask, only called by the server
+
+        Args:
+            mask (int): bit i is set when the light of controller i is on
+            animation (dict | None, optional): the animation playing. Defaults to None.
+        """
+        packed = 0
+        if animation is not None:
+            packed = (
+                PATTERNS.index(animation["pattern"]) + 1
+                | (int(animation["period"] * 1000) & 0xFFFFFF) << 8
+                | animation["mask"] << 32
+            )
+        version = self.__get(LIGHTS_VERSION) + 1
+        self.__set(LIGHTS_VERSION, version)
+        self.__set(LIGHTS_MASK, mask)
+        self.__set(LIGHTS_ANIMATION, packed)
+        self.__set(LIGHTS_CHECK, version)
+
+    def lights(self) -> tuple[int, dict | None, int]:
+        """read the light mask, only called by the buzz controllers process
+
+        Returns:
+            tuple[int, dict | None, int]: the mask, the animation and their version
+        """
+        while True:
+            version = self.__get(LIGHTS_CHECK)
+            mask = self.__get(LIGHTS_MASK)
+            packed = self.__get(LIGHTS_ANIMATION)
+            if self.__get(LIGHTS_VERSION) == version:
+                break
+        animation = None
+        if packed & 0xFF:
+            animation = {
+                "pattern": PATTERNS[(packed & 0xFF) - 1],
+                "mask": packed >> 32,
+                "period": (packed >> 8 & 0xFFFFFF) / 1000,
+            }
+        return mask, animation, version
+
+    def replaced(self) -> bool:
+        """check if the server created a new segment since this one was attached
+
+        Returns:
+            bool: the segment was replaced or removed
+        """
+        try:
+            current = PressRing(self.shm.name)
+        except FileNotFoundError:
+            return True
+        replaced = current.epoch != self.epoch
+        current.close()
+        return replaced
+
+    def close(self):
+        """detach from the segment, and remove it when it was created here"""
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,39 @@
+# pylint: disable=too-few-public-methods
+"""Module responsable for the stand-ins used by the tests and the benchmarks"""
+
+from gamestate.gamestate import GameState
+
+
+class Lights:
+    """Class to stand in for the shared memory ring, keeping the last lights
+    the game wants instead of sending them to the bridge
+    """
+
+    def __init__(self):
+        self.mask = 0
+        self.animation: dict | None = None
+
+    def set_lights(self, mask: int, animation: dict | None):
+        """keep the lights the game wants
+
+        Args:
+            mask (int): the light mask
+            animation (dict | None): the animation playing
+        """
+        self.mask = mask
+        self.animation = animation
+
+
+def new_game(teams: int = 3) -> GameState:
+    """create a game with teams of one player
+
+    Args:
+        teams (int, optional): the number of teams, none are set when 0. Defaults to 3.
+
+    Returns:
+        GameState: the game state
+    """
+    state = GameState("localhost", 0)
+    if teams:
+        state.set_teams([[f"player {i}"] for i in range(teams)])
+    return state
@@ -0,0 +1,23 @@
+"""Module responsable for keeping the background tasks alive until they finish"""
+
+import asyncio
+from typing import Coroutine
+
+
+def spawn(tasks: set[asyncio.Task], coro: Coroutine) -> asyncio.Task:
+    """run a coroutine in a new task, kept in a set until it finishes
+
+    The event loop only keeps weak references to tasks, so a task nothing
+    else refers to may be garbage collected before it finishes.
+
+    Args:
+        tasks (set[asyncio.Task]): the set keeping the running tasks
+        coro (Coroutine): the coroutine to run
+
+    Returns:
+        asyncio.Task: the new task
+    """
+    task = asyncio.create_task(coro)
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+    return task
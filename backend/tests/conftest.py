@@ -0,0 +1,45 @@
+"""Shared setup of the backend tests"""
+
+import os
+import sys
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# pylint: disable=wrong-import-position
+from broadcast import Broadcaster
+from buzz_interface import Buzz
+from protocol import StateStream
+from roles import ROLES, Projector
+from saves import EventLog
+from stubs import Lights, new_game
+import server
+import views
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    """run from the root of the repository, where the paths of the game files
+    start, with the lights sent nowhere
+    """
+    monkeypatch.chdir(os.path.dirname(BACKEND))
+    monkeypatch.setattr(Buzz, "ring", Lights())
+
+
+@pytest.fixture(name="game_server")
+def fixture_game_server(tmp_path, monkeypatch):
+    """the server with a new game without teams, its own event log and no
+    websocket client
+    """
+    app = server.app
+    log = EventLog(str(tmp_path / "saves.db"))
+    monkeypatch.setattr(app, "my_log", log)
+    monkeypatch.setattr(app, "my_state", log.open(lambda: new_game(0)))
+    monkeypatch.setattr(app, "my_streams", {role: StateStream() for role in ROLES})
+    monkeypatch.setattr(app, "my_projector", Projector())
+    monkeypatch.setattr(app, "my_broadcaster", Broadcaster())
+    monkeypatch.setattr(app, "my_views", views.StateViews(app.my_state))
+    server.publish_roles(app.my_state.to_dict())
+    yield app
+    log.close()
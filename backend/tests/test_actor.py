@@ -0,0 +1,106 @@
+"""Tests of the command actor applying the changes to the game state"""
+
+import asyncio
+import random
+from collections import Counter
+import httpx
+import pytest
+import server
+from saves import EventLog
+from stubs import new_game
+from gamestate.gamestate import States
+
+CLIENTS = 20
+COMMANDS = 100
+
+
+def random_command(rng: random.Random) -> tuple:
+    """pick a command, some of them select questions that are not on the board
+
+    Args:
+        rng (random.Random): the random generator
+
+    Returns:
+        tuple: the path and the body of the request
+    """
+    return rng.choice(
+        [
+            ("/buzz", {"controller": rng.randrange(3), "color": "red"}),
+            ("/buzz_start", None),
+            ("/answer", {"correct": rng.random() < 0.5}),
+            ("/question", {"id": rng.randrange(40)}),
+            ("/skip", None),
+            ("/fix/points/", {"team_id": rng.randrange(3), "points": 10}),
+            ("/fix/selecting/", {"team_id": rng.randrange(3)}),
+        ]
+    )
+
+
+async def run_clients(app, rng: random.Random) -> list:
+    """send the commands of every client to the endpoints concurrently, with
+    the actor and the scheduler running
+
+    Args:
+        app (FastAPI): the server
+        rng (random.Random): the random generator
+
+    Returns:
+        list: the path of every command applied
+    """
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    applied = []
+
+    async def client(http: httpx.AsyncClient):
+        for _ in range(COMMANDS):
+            path, body = random_command(rng)
+            response = await http.post(path, json=body)
+            if response.status_code == 200:
+                applied.append(path)
+
+    async with server.lifespan(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as http:
+            response = await http.post("/teams", json={"teams": [["a"], ["b"], ["c"]]})
+            response.raise_for_status()
+            await asyncio.gather(*(client(http) for _ in range(CLIENTS)))
+    return applied
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_concurrent_commands_keep_the_state_consistent(game_server, monkeypatch, seed):
+    """thousands of commands sent at once are each recorded and published
+    once, and leave a state the event log reproduces
+    """
+    log = game_server.my_log
+    published = []
+    publish_state = server.publish_state
+
+    async def publish():
+        published.append(log.seq)
+        await publish_state()
+
+    monkeypatch.setattr(server, "publish_state", publish)
+
+    applied = asyncio.run(run_clients(game_server, random.Random(seed)))
+
+    state = game_server.my_state
+    teams = state.list_teams()
+    history = log.history()
+    assert 0 < len(applied) < CLIENTS * COMMANDS
+    assert Counter(e["action"] for e in history[1:]) == Counter(
+        path.strip("/") for path in applied
+    )
+    # each publish saw exactly one more event than the one before
+    assert published == list(range(1, len(history) + 1))
+    assert history[-1]["scores"] == [t.balance for t in teams]
+    assert state.list_leaderboard() == sorted(teams, key=lambda t: (-t.balance, t.id))
+    assert isinstance(state.state, States)
+
+    replay = EventLog(log.path)
+    try:
+        replayed = replay.open(lambda: new_game(0))
+        assert replayed.teams_controller.list_dicts() == [t.to_dict() for t in teams]
+        assert replayed.state == state.state
+    finally:
+        replay.close()
@@ -0,0 +1,102 @@
+"""Tests of the order the buzz presses are applied in"""
+
+import asyncio
+import random
+import time
+import pytest
+from arbiter import BuzzArbiter
+from presses import PressReceiver
+
+MS = 1_000_000
+
+
+async def deliver(presses: dict, jitter: float, seed: int) -> list:
+    """send the presses of each buzz controllers process through the arbiter,
+    each process with its own clock, and its message delayed by the network
+
+    Args:
+        presses (dict): (controller, time pressed on the server clock) of each process
+        jitter (float): the maximum delay of a message, in seconds
+        seed (int): the seed of the clocks and delays
+
+    Returns:
+        list: the controllers of every window applied
+    """
+    rng = random.Random(seed)
+    applied = []
+
+    async def apply(window: list):
+        applied.append([press["controller"] for press in window])
+
+    arbiter = BuzzArbiter(apply, window=0.05)
+    receiver = PressReceiver(arbiter)
+
+    async def send(session: str, pressed: list):
+        skew = rng.randrange(-(10**12), 10**12)
+        receiver.clocks[session] = -skew
+        message = [
+            {"seq": seq, "controller": controller, "color": "red", "at": at + skew}
+            for seq, (controller, at) in enumerate(pressed, 1)
+        ]
+        await asyncio.sleep(rng.uniform(0, jitter))
+        new, _ = receiver.ingest(session, message)
+        await arbiter.submit(new)
+
+    await asyncio.gather(*(send(s, p) for s, p in presses.items()))
+    return applied
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_presses_are_applied_in_the_order_they_were_pressed(seed):
+    """presses from processes with skewed clocks and delayed messages are
+    applied by the time they were pressed
+    """
+    rng = random.Random(seed)
+    start = time.monotonic_ns()
+    # near simultaneous presses, a few hundred microseconds apart
+    times = sorted(rng.sample(range(0, 2 * MS, 50_000), 8))
+    controllers = list(range(8))
+    rng.shuffle(controllers)
+    presses = {f"process-{i % 3}": [] for i in range(3)}
+    for i, (controller, at) in enumerate(zip(controllers, times)):
+        presses[f"process-{i % 3}"].append((controller, start + at))
+
+    applied = asyncio.run(deliver(presses, 0.02, seed))
+
+    assert applied == [controllers]
+
+
+def test_presses_without_a_clock_are_applied_in_the_order_received():
+    """the presses of a process that sent no clock are timed when received"""
+    async def scenario() -> list:
+        applied = []
+
+        async def apply(window: list):
+            applied.append([press["controller"] for press in window])
+
+        arbiter = BuzzArbiter(apply, window=0.02)
+        receiver = PressReceiver(arbiter)
+        first, _ = receiver.ingest("a", [{"seq": 1, "controller": 3, "at": 5}])
+        await asyncio.sleep(0.001)
+        second, _ = receiver.ingest("b", [{"seq": 1, "controller": 1, "at": 1}])
+        await asyncio.gather(arbiter.submit(second), arbiter.submit(first))
+        return applied
+
+    assert asyncio.run(scenario()) == [[3, 1]]
+
+
+def test_presses_sent_again_are_ignored():
+    """presses resent after a reconnection are applied once"""
+    receiver = PressReceiver(BuzzArbiter(None))
+    receiver.clocks["a"] = 0
+    first, last = receiver.ingest(
+        "a",
+        [{"seq": 1, "controller": 0, "at": 1}, {"seq": 2, "controller": 1, "at": 2}],
+    )
+    assert [p["seq"] for p in first] == [1, 2] and last == 2
+
+    again, last = receiver.ingest(
+        "a",
+        [{"seq": 2, "controller": 1, "at": 2}, {"seq": 3, "controller": 2, "at": 3}],
+    )
+    assert [p["seq"] for p in again] == [3] and last == 3
@@ -0,0 +1,42 @@
+# pylint: disable=too-few-public-methods
+"""Tests of the websocket clients outbound queues"""
+
+import asyncio
+import time
+from broadcast import Broadcaster, Client
+
+
+class SlowSocket:
+    """Class to stand in for a websocket that takes a while to send"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.sent: list[tuple[str, float]] = []
+
+    async def send_text(self, frame: str):
+        """send a frame, recording when it was sent
+
+        Args:
+            frame (str): the frame
+        """
+        await asyncio.sleep(self.delay)
+        self.sent.append((frame, time.monotonic()))
+
+
+def test_callable_frames_are_encoded_when_sent():
+    """a frame queued as a function is encoded after the frames before it"""
+
+    async def run():
+        ws = SlowSocket(0.05)
+        client = Client(ws, Broadcaster(), "full", "fix")
+        queued = time.monotonic()
+        client.push("first")
+        client.push(lambda: str(time.monotonic()))
+        while len(ws.sent) < 2:
+            await asyncio.sleep(0.01)
+        client.task.cancel()
+        return queued, ws.sent
+
+    queued, sent = asyncio.run(run())
+    assert sent[0][0] == "first"
+    assert float(sent[1][0]) >= sent[0][1] > queued
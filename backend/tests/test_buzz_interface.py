@@ -0,0 +1,152 @@
+"""Tests of the light masks sent to the buzz controllers bridge"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+import json
+import time
+import pytest
+import buzz_interface
+from buzz_interface import Buzz
+
+
+class Bridge(ThreadingHTTPServer):
+    """Class to stand in for the bridge of the buzz controllers, keeping the
+    newest mask of each session like it does
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), BridgeHandler)
+        self.fail = False
+        self.delay = 0.0
+        self.calls: list[tuple[float, dict]] = []
+        self.mask = 0
+        self.session: str | None = None
+        self.version = -1
+
+    def set_lights(self, body: dict):
+        """keep a mask unless it is older than the one shown
+
+        Args:
+            body (dict): the mask, its version and the session sending it
+        """
+        if body["session"] == self.session and body["version"] < self.version:
+            return
+        self.mask, self.session, self.version = (
+            body["mask"],
+            body["session"],
+            body["version"],
+        )
+
+
+class BridgeHandler(BaseHTTPRequestHandler):
+    """Class to answer the requests sent to the bridge"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """answer a light mask sent by the game"""
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.calls.append((time.monotonic(), body))
+        time.sleep(self.server.delay)
+        status = 500 if self.server.fail else 200
+        if not self.server.fail:
+            self.server.set_lights(body)
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """keep the requests out of the test output"""
+
+
+@pytest.fixture(name="bridge")
+def fixture_bridge(monkeypatch):
+    """a bridge listening on a free port, with the lights sent to it over HTTP
+    and short timeouts
+    """
+    monkeypatch.setattr(Buzz, "ring", None)
+    monkeypatch.setattr(buzz_interface, "LIGHTS_TIMEOUT", 0.05)
+    monkeypatch.setattr(buzz_interface, "LIGHTS_BREAKER_MAX_BACKOFF", 0.4)
+    monkeypatch.setattr(buzz_interface, "LIGHTS_RECONCILE_INTERVAL", 60)
+    bridge = Bridge()
+    Thread(target=bridge.serve_forever, daemon=True).start()
+    yield bridge
+    bridge.shutdown()
+    bridge.server_close()
+
+
+@pytest.fixture(name="lights")
+def fixture_lights(bridge):
+    """the lights of a game, sent to the bridge"""
+    lights = Buzz("127.0.0.1", bridge.server_address[1])
+    yield lights
+    lights.close()
+
+
+def wait_until(condition, timeout: float = 5):
+    """wait for a condition to hold
+
+    Args:
+        condition (Callable[[], bool]): the condition
+        timeout (float, optional): seconds to wait for it. Defaults to 5.
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_the_breaker_opens_and_backs_off(bridge, lights):
+    """after the threshold of failures the bridge is only probed, less and less
+    often, until it answers again
+    """
+    threshold = buzz_interface.LIGHTS_BREAKER_THRESHOLD
+    bridge.fail = True
+    lights.turn_light_on([0])
+    wait_until(lambda: len(bridge.calls) >= threshold + 3)
+
+    assert lights.stats()["breaker_open"]
+    times = [at for at, _ in bridge.calls]
+    gaps = [b - a for a, b in zip(times[threshold - 1 :], times[threshold:])]
+    for i, gap in enumerate(gaps):
+        backoff = min(0.05 * 2**i, 0.4)
+        assert gap >= backoff * 0.9
+
+    bridge.fail = False
+    wait_until(lambda: lights.stats()["synced"])
+    assert not lights.stats()["breaker_open"]
+    assert bridge.mask == 1
+
+
+def test_a_stale_version_never_overwrites_a_newer_mask(bridge, lights):
+    """masks changed while a slow request is in flight reach the bridge in order"""
+    bridge.delay = 0.01
+
+    def change(controller: int):
+        for _ in range(20):
+            lights.turn_light_on([controller])
+            lights.turn_light_off([(controller + 1) % 4])
+
+    workers = [Thread(target=change, args=(c,)) for c in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wait_until(lambda: lights.stats()["synced"])
+
+    versions = [body["version"] for _, body in bridge.calls]
+    assert versions == sorted(versions)
+    assert len(versions) < 160
+    assert bridge.mask == lights.mask
+    assert bridge.version == lights.version
+
+
+def test_reconcile_fixes_drift(bridge, lights, monkeypatch):
+    """the mask is sent again to lights that got out of sync"""
+    monkeypatch.setattr(buzz_interface, "LIGHTS_RECONCILE_INTERVAL", 0.05)
+    lights.turn_light_on([1, 2])
+    wait_until(lambda: bridge.mask == 0b110)
+
+    # the bridge restarted with every light off
+    bridge.mask, bridge.session, bridge.version = 0, None, -1
+    wait_until(lambda: bridge.mask == 0b110)
@@ -0,0 +1,22 @@
+"""Tests of the turns of the game state"""
+
+from stubs import new_game
+
+
+def test_next_selecting_without_teams():
+    """no team selects the questions before the teams are set"""
+    state = new_game(0)
+    state.teams_controller.next_selecting()
+    assert state.teams_controller.selecting_id == 0
+
+
+def test_the_next_team_selects_when_every_team_playing_is_wrong():
+    """the teams out of a tiebreak do not count as teams still to answer"""
+    state = new_game(3)
+    state.teams_controller.playing = [0, 2]
+    state.select_question(0)
+    for controller in (0, 2):
+        state.set_answering()
+        state.buzz(controller, "red")
+        state.answer_question(False)
+    assert state.teams_controller.selecting_id == 1
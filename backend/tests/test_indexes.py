@@ -0,0 +1,101 @@
+"""Tests of the board and leaderboard indexes kept by the controllers"""
+
+import pickle
+import random
+import pytest
+from gamestate.models import Team
+from gamestate.questions_controller import QuestionsController
+from gamestate.teams_controller import TeamsController
+from stubs import new_game
+
+
+def naive_leaderboard(teams: list) -> list:
+    """sort the teams by balance, the first team in the list first on a tie"""
+    return sorted(teams, key=lambda t: t.balance, reverse=True)
+
+
+def naive_winning_team(teams: list) -> Team:
+    """find the first team with the most points"""
+    winner = teams[0]
+    for team in teams[1:]:
+        if team.balance > winner.balance:
+            winner = team
+    return winner
+
+
+def naive_tie(teams: list) -> list:
+    """list the ids of the teams with the most points"""
+    most = max(t.balance for t in teams)
+    return [t.id for t in teams if t.balance == most]
+
+
+def check_indexes(
+    teams_controller: TeamsController, questions_controller: QuestionsController
+):
+    """compare the indexes of the controllers with the naive versions"""
+    teams = teams_controller.teams
+    assert teams_controller.list_leaderboard() == naive_leaderboard(teams)
+    assert teams_controller.get_winning_team() is naive_winning_team(teams)
+
+    tied = naive_tie(teams)
+    # is_tie changes the teams playing, so it is asked to a copy
+    copy = pickle.loads(pickle.dumps(teams_controller))
+    assert copy.is_tie() == (len(tied) > 1)
+    if len(tied) > 1:
+        assert copy.playing == tied
+
+    questions = questions_controller.questions
+    assert questions_controller.unanswered == sum(not q.answered for q in questions)
+    assert questions_controller.questions_over() == all(q.answered for q in questions)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_indexes_match_the_naive_versions(seed):
+    """the indexes stay in step with the lists through a random game,
+    saved and loaded along the way
+    """
+    rng = random.Random(seed)
+    n = rng.randint(2, 6)
+    state = new_game(n)
+
+    for _ in range(300):
+        op = rng.random()
+        try:
+            if op < 0.2:
+                state.select_question(rng.randrange(30))
+            elif op < 0.35:
+                state.set_answering()
+            elif op < 0.55:
+                state.buzz(rng.randrange(n), "red")
+            elif op < 0.7:
+                state.answer_question(rng.random() < 0.5)
+            elif op < 0.8:
+                state.skip_question()
+            elif op < 0.9:
+                state.add_points(rng.randrange(n), rng.choice([-200, -100, 100, 200]))
+            else:
+                state = pickle.loads(pickle.dumps(state))
+        except (AssertionError, ValueError):
+            pass
+        check_indexes(state.teams_controller, state.questions_controller)
+
+    assert state.questions_controller.unanswered < 30
+
+
+def test_indexes_are_rebuilt_from_old_saves():
+    """a save from before the indexes were kept gets them on load"""
+    state = new_game()
+    state.add_points(2, 300)
+    state.add_points(0, 300)
+    state.select_question(4)
+    state.skip_question()
+
+    teams = state.teams_controller.__getstate__()
+    del teams["leaderboard"]
+    questions = state.questions_controller.__getstate__()
+    del questions["categories"], questions["unanswered"]
+    state.teams_controller.__setstate__(teams)
+    state.questions_controller.__setstate__(questions)
+
+    check_indexes(state.teams_controller, state.questions_controller)
+    assert state.questions_controller.unanswered == 29
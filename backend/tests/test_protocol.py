@@ -0,0 +1,144 @@
+"""Tests of the versioned state stream sent to patch clients"""
+
+from collections import deque
+from contextlib import ExitStack
+import copy
+import json
+import pytest
+from fastapi.testclient import TestClient
+from protocol import PATCH
+from roles import FIX, ROLES
+
+# commands that play a question, most of them set one-shot actions
+COMMANDS = [
+    ("/teams", {"teams": [["a"], ["b"], ["c"]]}),
+    ("/play_walkin", None),
+    ("/stop_walkin", None),
+    ("/question", {"id": 0}),
+    ("/buzz_start", None),
+    ("/buzz", {"controller": 1, "color": "red"}),
+    ("/answer", {"correct": False}),
+    ("/buzz_start", None),
+    ("/buzz", {"controller": 2, "color": "red"}),
+    ("/answer", {"correct": True}),
+    ("/fix/points/", {"team_id": 0, "points": 50}),
+]
+
+
+def apply_patch(document, ops: list):
+    """apply JSON Patch operations, as the frontend does
+
+    Args:
+        document: the document to patch
+        ops (list): the operations
+
+    Returns:
+        the patched document
+    """
+    document = copy.deepcopy(document)
+    for op in ops:
+        tokens = [
+            t.replace("~1", "/").replace("~0", "~") for t in op["path"].split("/")[1:]
+        ]
+        if not tokens:
+            document = op["value"]
+            continue
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token) if isinstance(parent, list) else token]
+        key = int(tokens[-1]) if isinstance(parent, list) else tokens[-1]
+        if op["op"] == "remove":
+            del parent[key]
+        else:
+            parent[key] = op["value"]
+    return document
+
+
+class PatchClient:
+    """Class to follow the state over a patch websocket"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        hello = json.loads(ws.receive_text())
+        self.epoch = hello["epoch"]
+        self.seq = hello["seq"]
+        self.state = hello["state"]
+
+    def apply(self, message: dict):
+        """apply a message received
+
+        Args:
+            message (dict): a snapshot, patch or batch of patches
+        """
+        if message["type"] == "snapshot":
+            self.seq, self.state = message["seq"], message["state"]
+        elif message["type"] == "batch":
+            for patch in message["messages"]:
+                self.apply(patch)
+            self.seq = message["seq"]
+        else:
+            assert message["seq"] == self.seq + 1
+            self.seq, self.state = message["seq"], apply_patch(
+                self.state, message["ops"]
+            )
+
+    def follow(self, seq: int):
+        """apply the messages received until reaching a version
+
+        Args:
+            seq (int): the version
+        """
+        while self.seq < seq:
+            self.apply(json.loads(self.ws.receive_text()))
+
+
+def snapshot(app, role: str) -> tuple:
+    """get the version and the state a new patch client of a role would get
+
+    Returns:
+        tuple: the version and the state
+    """
+    message = json.loads(app.my_streams[role].snapshot(PATCH))
+    return message["seq"], message["state"]
+
+
+def test_patches_reproduce_the_snapshot(game_server):
+    """the patches applied after each command give the snapshot"""
+    with TestClient(game_server) as c, ExitStack() as sockets:
+        clients = {
+            role: PatchClient(
+                sockets.enter_context(
+                    c.websocket_connect(f"/ws?protocol=patch&role={role}")
+                )
+            )
+            for role in ROLES
+        }
+        for path, body in COMMANDS:
+            c.post(path, json=body).raise_for_status()
+            for role, client in clients.items():
+                seq, state = snapshot(game_server, role)
+                client.follow(seq)
+                assert client.state == state
+
+
+@pytest.mark.parametrize("history", [64, 4])
+def test_resume_after_a_gap_reproduces_the_snapshot(game_server, history):
+    """a client that reconnects gets the versions it missed, resets included"""
+    for stream in game_server.my_streams.values():
+        stream.history = deque(maxlen=history)
+    with TestClient(game_server) as c:
+        with c.websocket_connect("/ws?protocol=patch") as ws:
+            client = PatchClient(ws)
+        for path, body in COMMANDS:
+            c.post(path, json=body).raise_for_status()
+
+        seq, state = snapshot(game_server, FIX)
+        with c.websocket_connect(
+            f"/ws?protocol=patch&epoch={client.epoch}&since={client.seq}"
+        ) as ws:
+            hello = json.loads(ws.receive_text())
+            missed = seq - client.seq
+            assert hello["type"] == ("batch" if missed <= history else "snapshot")
+            client.apply(hello)
+        assert client.seq == seq
+        assert client.state == state
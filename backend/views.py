@@ -0,0 +1,178 @@
+# pylint: disable=too-few-public-methods
+"""Module responsable for encoding the responses of the endpoints reading the game state"""
+
+import hashlib
+import os
+from typing import List
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+from broadcast import encode
+from gamestate.gamestate import GameState
+
+# every view can change with the next command, so caches must revalidate
+VIEWS_CACHE_CONTROL = os.getenv("VIEWS_CACHE_CONTROL", "no-cache")
+MANIFEST_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class Team(BaseModel):
+    """JSON representation of a team"""
+
+    names: List[str]
+    balance: int
+
+
+class Question(BaseModel):
+    """JSON representation of a question"""
+
+    id: int
+    statement: str
+    answer: str
+    image: str
+    value: int
+    category: str
+    answered: bool
+
+
+class State(BaseModel):
+    """JSON representation of answering a question"""
+
+    currentTeam: Team | None
+    state: int
+    teams: List[Team]
+
+
+TEAMS_VIEW = TypeAdapter(list[Team])
+QUESTIONS_VIEW = TypeAdapter(list[list[Question]])
+QUESTION_VIEW = TypeAdapter(Question)
+STATE_VIEW = TypeAdapter(State)
+
+
+class View:
+    """An encoded response and its entity tag, derived from its content so
+    it only changes when the response does
+    """
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes):
+        """Initialize the view
+
+        Args:
+            body (bytes): the encoded response
+        """
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+class StateViews:
+    """The responses of the endpoints reading the game state, encoded once
+    when the state is published and never changed afterwards
+
+    Publishing builds a new instance and replaces the reference to it, so a
+    request reads one version of the state from start to end, without
+    touching the game state while commands change it. The views of the teams
+    and questions whose dictionaries did not change are taken from the
+    previous instance instead of being encoded again.
+    """
+
+    __slots__ = (
+        "state",
+        "questions",
+        "question",
+        "winners",
+        "teams",
+        "manifest",
+        "sources",
+    )
+
+    def __init__(self, game: GameState, previous: "StateViews | None" = None):
+        """Encode the views of a game state
+
+        Args:
+            game (GameState): the game state
+            previous (StateViews | None, optional): the views published before.
+                Defaults to None.
+        """
+        teams = game.teams_controller.list_dicts()
+        questions = game.questions_controller.list_dicts()
+        manifest_hash = game.questions_controller.manifest_hash
+        current_team = game.get_current_team()
+        self.sources = (teams, questions, manifest_hash)
+        old_teams, old_questions, old_hash = (
+            previous.sources if previous is not None else (None, None, None)
+        )
+
+        if teams is old_teams:
+            self.teams, self.winners = previous.teams, previous.winners
+        else:
+            self.teams = View(TEAMS_VIEW.dump_json(TEAMS_VIEW.validate_python(teams)))
+            self.winners = View(
+                TEAMS_VIEW.dump_json(
+                    TEAMS_VIEW.validate_python(
+                        [t.to_dict() for t in game.list_leaderboard()]
+                    )
+                )
+            )
+        self.state = View(
+            STATE_VIEW.dump_json(
+                State(
+                    currentTeam=current_team.to_dict() if current_team else None,
+                    state=game.state.value,
+                    teams=teams,
+                )
+            )
+        )
+        if questions is old_questions:
+            self.questions, self.question = previous.questions, previous.question
+        else:
+            self.questions = View(
+                QUESTIONS_VIEW.dump_json(
+                    QUESTIONS_VIEW.validate_python(
+                        [
+                            [q.to_dict() for q in category]
+                            for category in game.list_categories().values()
+                        ]
+                    )
+                )
+            )
+            self.question: tuple[View, ...] = tuple(
+                (
+                    previous.question[i]
+                    if old_questions is not None
+                    and i < len(old_questions)
+                    and old_questions[i] is question
+                    else View(
+                        QUESTION_VIEW.dump_json(QUESTION_VIEW.validate_python(question))
+                    )
+                )
+                for i, question in enumerate(questions)
+            )
+        if manifest_hash == old_hash:
+            self.manifest = previous.manifest
+        else:
+            self.manifest = View(encode(game.questions_controller.manifest).encode())
+
+
+def json_response(
+    request: Request, view: View, cache_control: str = VIEWS_CACHE_CONTROL
+) -> Response:
+    """respond with an encoded view, or with 304 Not Modified when the
+    client already has it
+
+    Args:
+        request (Request): the request, with the entity tags the client has
+        view (View): the view
+        cache_control (str, optional): how long caches keep the view.
+            Defaults to VIEWS_CACHE_CONTROL.
+
+    Returns:
+        Response: JSON response
+    """
+    headers = {"ETag": view.etag, "Cache-Control": cache_control}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if view.etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=view.body, media_type="application/json", headers=headers)
@@ -1,97 +1,433 @@
+# pylint: disable=too-few-public-methods
+# pylint: disable=too-many-instance-attributes
 """Module responsable for controlling Buzz Controllers"""
 
+import asyncio
+import json
 import time
 import os
 import argparse
+import logging
+import secrets
 import tkinter as tk
-from typing import List
+from typing import Callable, List, Literal, Tuple
 from abc import abstractmethod
-from threading import Thread
+from threading import Condition, Lock, Thread
 from easyhid import Enumeration
 import requests
+import websockets
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from pydantic import BaseModel
 import uvicorn
+from backend.shm import SHM_NAME, SHM_POLL_INTERVAL, PressRing
+
+RECONNECT_DELAY = 0.5
+READ_TIMEOUT = 100
+
+# controllers on each dongle, and order of their buttons in the HID report
+PADS = 4
+COLORS = ["red", "yellow", "green", "orange", "blue"]
+
+
+class BuzzChannel:
+    """Persistent, ordered and acknowledged channel to send presses to the server
+
+    Every press gets a sequence number and is kept until the server acknowledges
+    it, presses that were not acknowledged are sent again after reconnecting.
+    Presses queued while a batch is being sent go together in the next batch.
+
+    Each press carries the monotonic time it was read at, and the hello sent on
+    every connection carries the current monotonic time, so the server can
+    order presses by when they happened instead of when they arrived.
+    """
+
+    def __init__(self, url: str):
+        """Initialize the channel and start the thread that runs it
+
+        Args:
+            url (str): websocket url of the server buzz endpoint
+        """
+        self.url = url
+        self.session = secrets.token_hex(4)
+        self.seq = 0
+        self.unacked: List[dict] = []
+        self.lock = Lock()
+        self.loop = asyncio.new_event_loop()
+        self.wakeup: asyncio.Event | None = None
+        Thread(
+            target=self.loop.run_until_complete, args=(self.__run(),), daemon=True
+        ).start()
+
+    def send(self, presses: List[Tuple[int, str, int]]):
+        """queue presses to be sent to the server
+
+        Args:
+            presses (List[Tuple[int, str, int]]): controller, color and
+                monotonic time in nanoseconds of each press
+        """
+        with self.lock:
+            for controller, color, at in presses:
+                self.seq += 1
+                self.unacked.append(
+                    {
+                        "seq": self.seq,
+                        "controller": controller,
+                        "color": color,
+                        "at": at,
+                    }
+                )
+        self.loop.call_soon_threadsafe(self.__wake)
+
+    def __wake(self):
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def __receive(self, ws):
+        """forget the presses the server acknowledged"""
+        async for message in ws:
+            ack = json.loads(message)["seq"]
+            with self.lock:
+                self.unacked = [p for p in self.unacked if p["seq"] > ack]
+
+    async def __send(self, ws):
+        """send the presses that were not sent on this connection yet"""
+        sent = 0
+        while True:
+            self.wakeup.clear()
+            with self.lock:
+                batch = [p for p in self.unacked if p["seq"] > sent]
+            if batch:
+                await ws.send(json.dumps({"type": "presses", "presses": batch}))
+                sent = batch[-1]["seq"]
+            else:
+                await self.wakeup.wait()
+
+    async def __run(self):
+        self.wakeup = asyncio.Event()
+        while True:
+            try:
+                async with websockets.connect(self.url) as ws:
+                    await ws.send(
+                        json.dumps(
+                            {
+                                "type": "hello",
+                                "session": self.session,
+                                "clock": time.monotonic_ns(),
+                            }
+                        )
+                    )
+                    tasks = [
+                        asyncio.create_task(self.__send(ws)),
+                        asyncio.create_task(self.__receive(ws)),
+                    ]
+                    done, pending = await asyncio.wait(
+                        tasks, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in pending:
+                        task.cancel()
+                    for task in done:
+                        task.result()
+            except (OSError, websockets.WebSocketException) as e:
+                logging.error("Buzz channel disconnected: %s", e)
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+class ShmChannel:
+    """Channel to send presses through shared memory, when the server runs on
+    the same machine
+
+    The server creates the segment, the channel attaches to it, and attaches
+    again when the server restarts. Presses are kept while the channel is not
+    attached or the ring is full. The light mask published by the server is
+    polled and passed to the lights callback.
+    """
+
+    def __init__(self, name: str = SHM_NAME):
+        """Initialize the channel and start the thread that runs it
+
+        Args:
+            name (str, optional): name of the segment. Defaults to SHM_NAME.
+        """
+        self.name = name
+        self.ring: PressRing | None = None
+        self.pending: List[Tuple[int, str, int]] = []
+        self.lock = Lock()
+        self.on_lights: Callable[[int, int, str, dict | None], bool] | None = None
+        Thread(target=self.__run, daemon=True).start()
+
+    def send(self, presses: List[Tuple[int, str, int]]):
+        """queue presses to be sent to the server
+
+        Args:
+            presses (List[Tuple[int, str, int]]): controller, color and
+                monotonic time in nanoseconds of each press
+        """
+        with self.lock:
+            self.pending.extend(presses)
+            self.__flush()
+
+    def watch_lights(self, on_lights: Callable[[int, int, str, dict | None], bool]):
+        """set the callback for the light masks published by the server
+
+        Args:
+            on_lights (Callable[[int, int, str, dict | None], bool]): called
+                with the mask, its version, the segment it came from and the
+                animation
+        """
+        self.on_lights = on_lights
+
+    def __flush(self):
+        """move the pending presses to the ring, must hold the lock"""
+        if self.ring is None:
+            return
+        while self.pending:
+            if not self.ring.push(*self.pending[0]):
+                logging.error("Buzz ring full, %d presses waiting", len(self.pending))
+                return
+            self.pending.pop(0)
+
+    def __attach(self):
+        """attach to the segment when it was created or replaced, must hold the lock"""
+        if self.ring is not None and not self.ring.replaced():
+            return
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        try:
+            self.ring = PressRing(self.name)
+            logging.info("Buzz ring attached")
+        except FileNotFoundError:
+            pass
+
+    def __run(self):
+        version = 0
+        checked_at = 0.0
+        while True:
+            with self.lock:
+                if time.monotonic() >= checked_at:
+                    checked_at = time.monotonic() + RECONNECT_DELAY
+                    ring = self.ring
+                    self.__attach()
+                    if self.ring is not ring:
+                        version = 0
+                self.__flush()
+                ring = self.ring
+
+            if ring is not None and self.on_lights is not None:
+                mask, animation, current = ring.lights()
+                if current != version:
+                    version = current
+                    self.on_lights(mask, current, str(ring.epoch), animation)
+            time.sleep(SHM_POLL_INTERVAL)
+
+
+def animation_frame(animation: dict, elapsed: float) -> int:
+    """Computes the lights an animation turns on at a given time
+
+    Args:
+        animation (dict): pattern, mask of its controllers and period in seconds
+        elapsed (float): seconds since the animation started
+
+    Returns:
+        int: the mask of the lights turned on, within the animation mask
+    """
+    mask = animation["mask"]
+    phase = (elapsed / animation["period"]) % 1 if animation["period"] > 0 else 0
+    if animation["pattern"] == "blink":
+        return mask if phase < 0.5 else 0
+    if animation["pattern"] == "flash":
+        return mask if phase < 0.2 else 0
+    if animation["pattern"] == "chase":
+        controllers = [i for i in range(mask.bit_length()) if mask & (1 << i)]
+        if not controllers:
+            return 0
+        return 1 << controllers[int(phase * len(controllers))]
+    return mask
 
 
 class BuzzBase:
     """Class for controlling Buzz Controllers"""
 
-    def __init__(self, host: str, port: int):
+    def __init__(self, host: str, port: int, transport: str = "ws"):
         self.server_url = f"http://{host}:{port}"
-        self.light_array = [0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]
-        self.button_state = [
-            {
-                "red": False,
-                "yellow": False,
-                "green": False,
-                "orange": False,
-                "blue": False,
-            },
-            {
-                "red": False,
-                "yellow": False,
-                "green": False,
-                "orange": False,
-                "blue": False,
-            },
-            {
-                "red": False,
-                "yellow": False,
-                "green": False,
-                "orange": False,
-                "blue": False,
-            },
-            {
-                "red": False,
-                "yellow": False,
-                "green": False,
-                "orange": False,
-                "blue": False,
-            },
-        ]
+        self.channel = None
+        if transport == "ws":
+            self.channel = BuzzChannel(f"ws://{host}:{port}/ws/buzz")
+        elif transport == "shm":
+            self.channel = ShmChannel()
+        self.lights = 0
+        self.frame = 0
+        self.animation: dict | None = None
+        self.animation_started = 0.0
+        self.lights_lock = Lock()
+        self.lights_changed = Condition(self.lights_lock)
+        self.lights_dirty = False
+        self.lights_thread: Thread | None = None
+        self.frame_interval = 1 / float(os.getenv("LIGHTS_FRAME_RATE", "30"))
+        self.written: dict[int, int] = {}
+        self.metrics = {
+            "writes": 0,
+            "suppressed": 0,
+            "merged": 0,
+            "frames": 0,
+            "cpu_ms": 0.0,
+            "max_frame_ms": 0.0,
+        }
+        self.lights_session: str | None = None
+        self.lights_version = -1
+        self.buttons: dict[int, int] = {}
+
+    def _edges(
+        self, buttons: int, at: int, device: int = 0
+    ) -> List[Tuple[int, str, int]]:
+        """
+        Lists the buttons that were pressed since the previous report of the
+        device, only the first one of each controller
+
+        Args:
+            buttons (int): bit 5 * pad + color of each button held down
+            at (int): monotonic time in nanoseconds the report was read
+            device (int): index of the dongle that sent the report
 
-    def _reset_state(self):
+        Returns:
+            List[Tuple[int, str, int]]: global controller id, color and time of each press
         """
-        Clears the state of the buttons
+        pressed = (buttons ^ self.buttons.get(device, 0)) & buttons
+        self.buttons[device] = buttons
+        presses = []
+        controller = device * PADS
+        while pressed:
+            bits = pressed & 0x1F
+            if bits:
+                color = (bits & -bits).bit_length() - 1
+                presses.append((controller, COLORS[color], at))
+            pressed >>= 5
+            controller += 1
+        return presses
+
+    def _handle_buzz(self, presses: List[Tuple[int, str, int]], confirm: bool = True):
         """
-        for i in range(4):
-            for j in ["red", "yellow", "green", "orange", "blue"]:
-                self.button_state[i][j] = False
+        Sends the presses to the server
 
-    def _handle_buzz_no_confirm(self):
+        Args:
+            presses (List[Tuple[int, str, int]]): controller, color and time of each press
+            confirm (bool): wait for the server to answer the HTTP requests
         """
-        Handles the data from the buzzes
+        if self.channel is not None:
+            if presses:
+                self.channel.send(presses)
+            return
+
+        for controller, color, _ in presses:
+            try:
+                requests.post(
+                    f"{self.server_url}/buzz",
+                    json={"controller": controller, "color": color},
+                    timeout=10 if confirm else 0.00000000000001,
+                )
+            except requests.exceptions.ReadTimeout:
+                if confirm:
+                    raise
+
+    def set_lights(
+        self, mask: int, version: int, session: str, animation: dict | None = None
+    ) -> bool:
+        """Set the lights of every controller at once
+
+        Args:
+            mask (int): bit i is set when the light of controller i is on
+            version (int): version of the mask, older versions are ignored
+            session (str): id of the sender, versions are compared within a session
+            animation (dict | None): animation to play over the mask, it keeps
+                playing while the same one is set
+
+        Returns:
+            bool: the mask was applied
         """
+        with self.lights_lock:
+            if session == self.lights_session and version < self.lights_version:
+                return False
+            self.lights_session = session
+            self.lights_version = version
+            if animation != self.animation:
+                self.animation = animation
+                self.animation_started = time.monotonic()
+            self.__show_lights(mask)
+            return True
+
+    def change_lights(self, on: int, off: int):
+        """Turn some lights on and others off
 
-        for i in range(0, 4):
-            for color, value in self.button_state[i].items():
-                if value:
-                    try:
-                        requests.post(
-                            f"{self.server_url}/buzz",
-                            json={"controller": i, "color": color},
-                            timeout=0.00000000000001,
-                        )
-                    except requests.exceptions.ReadTimeout:
-                        pass
-                    break
+        Args:
+            on (int): mask of the lights to turn on
+            off (int): mask of the lights to turn off
+        """
+        with self.lights_lock:
+            self.__show_lights((self.lights | on) & ~off)
+
+    def __show_lights(self, mask: int):
+        """change the light mask and wake up the writer, must hold the lock
 
-    def _handle_buzz(self):
+        Args:
+            mask (int): bit i is set when the light of controller i is on
         """
-        Handles the data from the buzzes
+        if self.lights_dirty:
+            self.metrics["merged"] += 1
+        self.lights = mask
+        self.lights_dirty = True
+        if self.lights_thread is None:
+            self.lights_thread = Thread(target=self.__write_lights, daemon=True)
+            self.lights_thread.start()
+        self.lights_changed.notify()
+
+    def __write_lights(self):
+        """write the lights at most once per frame, the changes made within a
+        frame are written together
+
+        While an animation plays a frame is drawn at every interval, otherwise
+        only when the mask changes. The processor time spent on each frame is
+        measured, so it can be checked it leaves the readers alone.
         """
-
-        for i in range(0, 4):
-            for color, value in self.button_state[i].items():
-                if value:
-                    requests.post(
-                        f"{self.server_url}/buzz",
-                        json={"controller": i, "color": color},
-                        timeout=10,
+        next_frame = 0.0
+        while True:
+            with self.lights_changed:
+                while not self.lights_dirty and self.animation is None:
+                    self.lights_changed.wait()
+            time.sleep(max(next_frame - time.monotonic(), 0))
+            started = time.thread_time()
+            with self.lights_lock:
+                self.lights_dirty = False
+                self.frame = self.lights
+                if self.animation is not None:
+                    elapsed = time.monotonic() - self.animation_started
+                    self.frame = (self.lights & ~self.animation["mask"]) | (
+                        animation_frame(self.animation, elapsed)
                     )
-                    break
+                self.update_controllers_lights()
+                spent = (time.thread_time() - started) * 1000
+                self.metrics["frames"] += 1
+                self.metrics["cpu_ms"] += spent
+                self.metrics["max_frame_ms"] = max(self.metrics["max_frame_ms"], spent)
+            next_frame = max(next_frame + self.frame_interval, time.monotonic())
+
+    def _write(self, device: int, pads: int) -> bool:
+        """check if the lights of a device changed since they were last
+        written, must hold the lock
+
+        Args:
+            device (int): index of the device
+            pads (int): light mask of the device
+
+        Returns:
+            bool: the lights must be written
+        """
+        if self.written.get(device) == pads:
+            self.metrics["suppressed"] += 1
+            return False
+        self.written[device] = pads
+        self.metrics["writes"] += 1
+        return True
 
     @abstractmethod
     def start(self):
@@ -101,69 +437,83 @@ class BuzzBase:
 
     @abstractmethod
     def update_controllers_lights(self):
-        """turn the lights of the given controllers off"""
+        """show the light mask on the controllers, must hold the lock"""
 
 
 class Buzz(BuzzBase):
     """Class for controlling Buzz Controllers"""
 
-    def __init__(self, host: str, port: int):
-        super().__init__(host, port)
+    def __init__(self, host: str, port: int, transport: str = "ws"):
+        super().__init__(host, port, transport)
 
         en = Enumeration()
-        devices = en.find(manufacturer="Namtai")
-        self.dev = devices[0]
-        self.dev.open()
-        self.dev.set_nonblocking(True)
+        # sorted so every dongle keeps its controller ids between runs
+        self.devices = sorted(en.find(manufacturer="Namtai"), key=lambda d: d.path)
+        if not self.devices:
+            raise RuntimeError("No buzz controllers found")
+        for dev in self.devices:
+            dev.open()
+            dev.set_nonblocking(False)
+        logging.info(
+            "Found %d buzz dongles, %d controllers",
+            len(self.devices),
+            len(self.devices) * PADS,
+        )
 
     def update_controllers_lights(self):
-        """Update the lights of the controllers"""
-        self.dev.write(self.light_array)
+        """Update the lights of the controllers, one write for each dongle"""
+        for i, dev in enumerate(self.devices):
+            pads = (self.frame >> (i * PADS)) & ((1 << PADS) - 1)
+            if not self._write(i, pads):
+                continue
+            dev.write(
+                [0x00]
+                + [0xFF if pads & (1 << pad) else 0x00 for pad in range(PADS)]
+                + [0x00, 0x00, 0x00]
+            )
 
-    def __parse_buzz_data(self, data):
+    def __read(self, device: int):
         """
-        Parses the data from the buzz
+        Reads the buzzes of one dongle
+
+        The reads block until a report arrives, hidapi does not expose a file
+        descriptor to wait on, so the timeout only bounds how long a read
+        can block.
+
+        Args:
+            device (int): index of the dongle
         """
-        self.button_state[0]["red"] = (data[2] & 0x01) != 0  # red
-        self.button_state[0]["yellow"] = (data[2] & 0x02) != 0  # yellow
-        self.button_state[0]["green"] = (data[2] & 0x04) != 0  # green
-        self.button_state[0]["orange"] = (data[2] & 0x08) != 0  # orange
-        self.button_state[0]["blue"] = (data[2] & 0x10) != 0  # blue
-        self.button_state[1]["red"] = (data[2] & 0x20) != 0  # red
-        self.button_state[1]["yellow"] = (data[2] & 0x40) != 0  # yellow
-        self.button_state[1]["green"] = (data[2] & 0x80) != 0  # green
-        self.button_state[1]["orange"] = (data[3] & 0x01) != 0  # orange
-        self.button_state[1]["blue"] = (data[3] & 0x02) != 0  # blue
-        self.button_state[2]["red"] = (data[3] & 0x04) != 0  # red
-        self.button_state[2]["yellow"] = (data[3] & 0x08) != 0  # yellow
-        self.button_state[2]["green"] = (data[3] & 0x10) != 0  # green
-        self.button_state[2]["orange"] = (data[3] & 0x20) != 0  # orange
-        self.button_state[2]["blue"] = (data[3] & 0x40) != 0  # blue
-        self.button_state[3]["red"] = (data[3] & 0x80) != 0  # red
-        self.button_state[3]["yellow"] = (data[4] & 0x01) != 0  # yellow
-        self.button_state[3]["green"] = (data[4] & 0x02) != 0  # green
-        self.button_state[3]["orange"] = (data[4] & 0x04) != 0  # orange
-        self.button_state[3]["blue"] = (data[4] & 0x08) != 0  # blue
+        dev = self.devices[device]
+        while True:
+            data = dev.read(5, READ_TIMEOUT)
+            if len(data) < 5:
+                continue
+            at = time.monotonic_ns()
+            buttons = (data[2] | data[3] << 8 | data[4] << 16) & 0xFFFFF
+            self._handle_buzz(self._edges(buttons, at, device))
 
     def start(self):
         """
-        Thread that reads the buzzes
+        Thread that reads the buzzes, with a thread for each dongle
         """
-        while True:
-            data = self.dev.read(5)
-            if data:
-                self._reset_state()
-                self.__parse_buzz_data(data)
-                self._handle_buzz()
-
-            time.sleep(0.001)
+        threads = [
+            Thread(target=self.__read, args=(i,), daemon=True)
+            for i in range(len(self.devices))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
 
 
 class VirtualBuzz(BuzzBase):
     """Class for Buzz controlling Virtual Buzz Controllers"""
 
-    def __init__(self, host: str, port: int):
-        super().__init__(host, port)
+    def __init__(
+        self, host: str, port: int, transport: str = "ws", controllers: int = PADS
+    ):
+        super().__init__(host, port, transport)
+        self.controllers = controllers
         self.red_buttons = []
 
     def __update_button_state(self, controller: int, color: str):
@@ -174,9 +524,7 @@ class VirtualBuzz(BuzzBase):
             controller (int): The controller pressed.
             color (str): The color of the button pressed.
         """
-        super()._reset_state()
-        self.button_state[controller][color] = True
-        super()._handle_buzz_no_confirm()
+        super()._handle_buzz([(controller, color, time.monotonic_ns())], confirm=False)
 
     def __create_controller_frame(self, root: tk.Tk, controller_index: int):
         """Creates a virtual buzz controller.
@@ -214,9 +562,11 @@ class VirtualBuzz(BuzzBase):
         """
         Updates the colors of the red circle buttons based on the light array.
         """
-        for i in range(4):
-            new_color = "#FF0000" if self.light_array[i + 1] == 0xFF else "#8B0000"
-            self.red_buttons[i].config(bg=new_color)
+        if not self._write(0, self.frame):
+            return
+        for i, button in enumerate(self.red_buttons):
+            new_color = "#FF0000" if self.frame & (1 << i) else "#8B0000"
+            button.config(bg=new_color)
 
     def start(self):
         """
@@ -225,7 +575,7 @@ class VirtualBuzz(BuzzBase):
         root = tk.Tk()
         root.title("Virtual Buzz Controllers")
 
-        for i in range(4):
+        for i in range(self.controllers):
             self.__create_controller_frame(root, i)
 
         root.mainloop()
@@ -241,12 +591,28 @@ if __name__ == "__main__":
         "--virtual", action="store_true", help="Enable virtual buzz buttons."
     )
 
+    parser.add_argument(
+        "--http",
+        action="store_true",
+        help="Send each press as an HTTP request instead of over a websocket.",
+    )
+
+    parser.add_argument(
+        "--controllers",
+        type=int,
+        default=PADS,
+        help="Number of virtual buzz controllers.",
+    )
+
     args = parser.parse_args()
+    TRANSPORT = "http" if args.http else os.getenv("BUZZ_TRANSPORT", "ws")
     buzzController = (
-        VirtualBuzz("localhost", SERVER_PORT)
+        VirtualBuzz("localhost", SERVER_PORT, TRANSPORT, args.controllers)
         if args.virtual
-        else Buzz("localhost", SERVER_PORT)
+        else Buzz("localhost", SERVER_PORT, TRANSPORT)
     )
+    if isinstance(buzzController.channel, ShmChannel):
+        buzzController.channel.watch_lights(buzzController.set_lights)
     t = Thread(target=buzzController.start, args=())
     t.start()
 
@@ -268,20 +634,76 @@ if __name__ == "__main__":
         Args:
             light_request (LightRequest): controllers
         """
-        for i in body.controllers:
-            buzzController.light_array[i + 1] = 0xFF
-        buzzController.update_controllers_lights()
+        buzzController.change_lights(sum(1 << i for i in set(body.controllers)), 0)
         return {"status": "success"}
 
+    class Animation(BaseModel):
+        """Request model"""
+
+        pattern: Literal["blink", "chase", "flash"]
+        mask: int
+        period: float
+
+    class LightsRequest(BaseModel):
+        """Request model"""
+
+        mask: int
+        version: int
+        session: str
+        animation: Animation | None = None
+
+    class LightsResponse(BaseModel):
+        """Response model"""
+
+        status: str
+        version: int
+
+    @app.post("/lights", response_model=LightsResponse)
+    def post_lights(body: LightsRequest):
+        """Set the lights of every controller at once
+        Args:
+            body (LightsRequest): light mask and its version
+        """
+        applied = buzzController.set_lights(
+            body.mask,
+            body.version,
+            body.session,
+            body.animation.model_dump() if body.animation else None,
+        )
+        return {
+            "status": "success" if applied else "stale",
+            "version": buzzController.lights_version,
+        }
+
+    class LightsStatus(BaseModel):
+        """Response model"""
+
+        mask: int
+        version: int
+        writes: int
+        suppressed: int
+        merged: int
+        frames: int
+        cpu_ms: float
+        max_frame_ms: float
+
+    @app.get("/lights", response_model=LightsStatus)
+    def get_lights():
+        """Report the light mask and the writes done to the controllers"""
+        with buzzController.lights_lock:
+            return {
+                "mask": buzzController.lights,
+                "version": buzzController.lights_version,
+                **buzzController.metrics,
+            }
+
     @app.post("/off", response_model=Reponse)
     def post_off(body: LightRequest):
         """Turn the lights of the given controllers off
         Args:
             light_request (LightRequest): controllers
         """
-        for i in body.controllers:
-            buzzController.light_array[i + 1] = 0x00
-        buzzController.update_controllers_lights()
+        buzzController.change_lights(0, sum(1 << i for i in set(body.controllers)))
         return {"status": "success"}
 
     uvicorn.run(app, host="0.0.0.0", port=CONTROLLER_PORT)
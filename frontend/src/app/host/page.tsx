@@ -2,6 +2,7 @@
 
 import { useEffect, useState } from "react";
 
+import { handleClockMessage, syncClock } from "../../lib/clock";
 import GameState from "../../components/GameState";
 
 import { State } from "../../types";
@@ -10,10 +11,15 @@ export default function Host() {
   const [state, setState] = useState<State>(null);
 
   useEffect(() => {
-    const socket = new WebSocket(process.env.NEXT_PUBLIC_WS_URL);
+    const url = new URL(process.env.NEXT_PUBLIC_WS_URL);
+    url.searchParams.set("role", "host");
+    const socket = new WebSocket(url);
+    syncClock(socket);
 
     socket.addEventListener("message", (event) => {
-      const newState = JSON.parse(event.data);
+      const message = JSON.parse(event.data);
+      if (handleClockMessage(message)) return;
+      const newState = message;
       setState(newState);
     });
   }, []);
@@ -5,16 +5,22 @@ import useSound from "use-sound";
 
 import { State } from "../../types.js";
 
+import { handleClockMessage, syncClock } from "../../lib/clock";
 import GameState from "../../components/GameState";
 
 const Staff = () => {
   const [state, setState] = useState<State>(null);
 
   useEffect(() => {
-    const socket = new WebSocket(process.env.NEXT_PUBLIC_WS_URL);
+    const url = new URL(process.env.NEXT_PUBLIC_WS_URL);
+    url.searchParams.set("role", "host");
+    const socket = new WebSocket(url);
+    syncClock(socket);
 
     socket.addEventListener("message", (event) => {
-      const newState: State = JSON.parse(event.data);
+      const message = JSON.parse(event.data);
+      if (handleClockMessage(message)) return;
+      const newState: State = message;
       setState(newState);
     });
   }, []);
@@ -2,6 +2,7 @@ import { useState, useEffect, useCallback } from "react";
 import useSound from "use-sound";
 import { State } from "../../../types";
 import * as api from "../../../lib/api";
+import { msUntil } from "../../../lib/clock";
 import Image from "next/image";
 
 interface GameAnsweringQuestionProps {
@@ -11,7 +12,7 @@ interface GameAnsweringQuestionProps {
   inView: boolean;
 }
 
-function CountdownTimer({ initialSeconds, refreshRate, role }) {
+function CountdownTimer({ initialSeconds, deadline, refreshRate, role }) {
   const [seconds, setSeconds] = useState(initialSeconds);
   const [playEndSound] = useSound("/sounds/wrong.mp3", { interrupt: true });
 
@@ -24,13 +25,19 @@ function CountdownTimer({ initialSeconds, refreshRate, role }) {
     }
 
     // Set up the timer
+    // follow the deadline of the server once the clock is synced
     const timer = setInterval(() => {
-      setSeconds((prevSeconds) => Math.max(0, prevSeconds - 1 / refreshRate));
+      const left = msUntil(deadline);
+      setSeconds((prevSeconds) =>
+        left != null
+          ? Math.min(initialSeconds, Math.max(0, left / 1000))
+          : Math.max(0, prevSeconds - 1 / refreshRate),
+      );
     }, 1000.0 / refreshRate);
 
     // Clean up the timer
     return () => clearInterval(timer);
-  }, [seconds, refreshRate, playEndSound, role]);
+  }, [seconds, initialSeconds, deadline, refreshRate, playEndSound, role]);
 
   const percentage = (seconds / initialSeconds) * 100;
 
@@ -188,6 +195,11 @@ export default function GameAnsweringQuestion({
                 <CountdownTimer
                   role={role}
                   initialSeconds={timer()}
+                  deadline={
+                    state.state === 4
+                      ? state.deadlines?.countdown
+                      : state.deadlines?.answer
+                  }
                   refreshRate={60}
                 />
               )}
@@ -0,0 +1,47 @@
+// Offset between this page and the monotonic clock of the server, estimated
+// from ping/pong exchanges over the websocket, keeping the one with the
+// shortest round trip as it is the least affected by the network.
+const SYNC_INTERVAL = 10000;
+const SAMPLES = 8;
+
+type Sample = { offset: number; roundTrip: number };
+
+let samples: Sample[] = [];
+let offset: number | null = null;
+
+export function syncClock(socket: WebSocket) {
+  const ping = () => {
+    if (socket.readyState === WebSocket.OPEN) {
+      socket.send(JSON.stringify({ type: "ping", t0: performance.now() }));
+    }
+  };
+  socket.addEventListener("open", () => {
+    for (let i = 0; i < 4; i++) setTimeout(ping, i * 250);
+  });
+  const timer = setInterval(ping, SYNC_INTERVAL);
+  socket.addEventListener("close", () => clearInterval(timer));
+}
+
+export function handleClockMessage(message: any): boolean {
+  if (message?.type !== "pong") {
+    return false;
+  }
+  const t3 = performance.now();
+  const { t0, received, sent } = message;
+  samples.push({
+    offset: (received - t0 + (sent - t3)) / 2,
+    roundTrip: t3 - t0 - (sent - received),
+  });
+  samples = samples.slice(-SAMPLES);
+  offset = samples.reduce((a, b) => (b.roundTrip < a.roundTrip ? b : a)).offset;
+  return true;
+}
+
+// milliseconds left until a deadline published by the server, or null when
+// the clock was not synced yet
+export function msUntil(deadline: number | null): number | null {
+  if (deadline == null || offset == null) {
+    return null;
+  }
+  return deadline - offset - performance.now();
+}
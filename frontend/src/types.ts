@@ -3,15 +3,17 @@ export type Team = {
   balance: number;
 };
 
+// the board only has id, value, category and answered for the audience and
+// host roles, and the audience never gets the answer
 export type Question = {
   id: number;
-  statement: string;
-  answer: string;
-  image: string;
+  statement?: string;
+  answer?: string;
+  image?: string;
   value: number;
   category: string;
   answered: boolean;
-  tta: number; // seconds
+  tta?: number; // seconds
 };
 
 export type State = {
@@ -37,4 +39,11 @@ export type State = {
     playSelectingQuestionSound: boolean;
     playWalkInSong: boolean;
   };
+  // milliseconds on the server clock, see lib/clock
+  deadlines: {
+    answer: number | null;
+    countdown: number | null;
+  };
+  // hash of the question contents, served by /manifest/{hash}, not sent to the audience
+  manifest?: string;
 };